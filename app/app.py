@@ -1,5 +1,6 @@
-import json
-import pandas as pd
+import store
+import logging
+from threading import Thread
 import dash.html as html
 from layout import layout
 import dash_bootstrap_components as dbc
@@ -11,10 +12,14 @@ import functions as api
 
 # Initialize the app
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+logger = logging.getLogger(__name__)
 
 # App layout
 app.layout = layout
 
+# Prepare shared data and charts in the background
+Thread(target=api.warm_up, daemon=True).start()
+
 # ------------------------ Login callback ----------------------------
 @app.callback(
     Output('app-data', 'data'),
@@ -32,39 +37,32 @@ def login(button, email, password, user, league):
         try:
             # Enter demo mode when login form is not filled
             if not email and not password and not user and not league:
-                app_data = {
-                    'market': pd.read_excel('./data/market.xlsx').to_json(),
-                    'rounds': pd.read_excel('./data/rounds.xlsx').to_json(),
-                    'players': pd.read_excel('./data/players.xlsx').to_json(),
-                    'advanced': pd.read_excel('./data/advanced.xlsx').to_json(),
-                    'standings': pd.read_excel('./data/standings.xlsx').to_json(),
+                datasets = {
+                    'market': api.get_demo('market'),
+                    'rounds': api.get_demo('rounds'),
+                    'players': api.get_demo('players'),
+                    'advanced': api.get_demo('advanced'),
+                    'standings': api.get_demo('standings'),
                 }
             # Else create a session and login
             else:
-                session, token = api.get_login(email, password)
+                token = api.get_login(email, password)
                 # Request all data
-                market_df, rounds_df = api.get_market(session, token, epoch, league, user)
-                players_df = api.get_players(session)
-                advanced_df = api.get_advanced_stats()
-                standings_df = api.get_standings(session, token, league, user)
-                # Convert to JSON
-                market_json = market_df.to_json() if not market_df.empty else "{}"
-                rounds_json = rounds_df.drop_duplicates(subset=['round', 'member'], inplace=True).to_json() if not rounds_df.empty else "{}"
-                players_json = players_df.to_json() if not players_df.empty else "{}"
-                advanced_json = advanced_df.to_json() if not advanced_df.empty else "{}"
-                standings_json = standings_df.to_json() if not advanced_df.empty else "{}"
-                # Form app data dict
-                app_data = {
-                    'market': market_json,
-                    'rounds': rounds_json,
-                    'players': players_json,
-                    'advanced': advanced_json,
-                    'standings': standings_json
-                }
+                datasets = api.get_league_data(token, epoch, league, user)
+                if not datasets['rounds'].empty:
+                    datasets['rounds'] = datasets['rounds'].drop_duplicates(subset=['round', 'member'])
+            # Summarize league transactions once for the scoreboard
+            datasets['ledger'] = api.get_ledger(datasets['market'], datasets['rounds'], datasets['standings'])
+            # Keep data in server memory, only the session token goes to the browser
+            app_data = store.save(datasets)
             return app_data, no_update, False
-        except:
-            # Return on exception
-            return no_update, 'Error during loging. Try again.', no_update
+        except api.LoginError as error:
+            # Return on exception, the details are only logged on the server
+            logger.exception('Error during login')
+            return no_update, f'Error during login: {error}. Try again.', no_update
+        except Exception:
+            logger.exception('Error during login')
+            return no_update, 'Error during login. Try again.', no_update
     else:
         return no_update, no_update, no_update
 
@@ -103,22 +101,23 @@ def update_accordion(path):
     prevent_initial_call=True
 )
 def update_chart(btn_efficiency, btn_links, btn_fitness, btn_advanced, btn_filter, app_data, name1, name2):
-    # Get data from session
+    # Get only the data each chart needs from session
     trigger = ctx.triggered[0]['prop_id'].split('.')[0]
-    market_df = pd.DataFrame(json.loads(app_data['market']))
-    players_df = pd.DataFrame(json.loads(app_data['players']))
-    advanced_df = pd.DataFrame(json.loads(app_data['advanced']))
     # Deliver desired info
     if trigger == 'btn-efficiency':
-        return api.plot_player_efficiency(players_df), {'display': 'block'}, {'display': 'none'}
+        players_df = store.load(app_data, 'players')[0]
+        return api.get_figure(api.plot_player_efficiency, players_df), {'display': 'block'}, {'display': 'none'}
     elif trigger == 'btn-links':
-        return api.plot_links(market_df), {'display': 'block'}, {'display': 'none'}
+        market_df = store.load(app_data, 'market')[0]
+        return api.get_figure(api.plot_links, market_df), {'display': 'block'}, {'display': 'none'}
     elif trigger == 'btn-fitness':
-        return api.plot_recent_fitness(players_df), {'display': 'block'}, {'display': 'none'}
+        players_df = store.load(app_data, 'players')[0]
+        return api.get_figure(api.plot_recent_fitness, players_df), {'display': 'block'}, {'display': 'none'}
     elif trigger == 'btn-advanced':
         return {'display': 'none'}, {'display': 'none'}, {'display': 'block'}
     elif trigger == 'btn-chart-filter':
-        return api.plot_advanced(advanced_df, name1, name2), {'display': 'block'}, {'display': 'block'}
+        advanced_df = store.load(app_data, 'advanced')[0]
+        return api.get_figure(api.plot_advanced, advanced_df, (name1, name2)), {'display': 'block'}, {'display': 'block'}
     else:
         return no_update, no_update
 
@@ -131,7 +130,7 @@ def update_chart(btn_efficiency, btn_links, btn_fitness, btn_advanced, btn_filte
 )
 def update_players(position, app_data):
     # Get data from session
-    df = pd.DataFrame(json.loads(app_data['advanced']))
+    df = store.load(app_data, 'advanced')[0]
     # Filter data by position
     names = list(df.loc[df['position'] == position]['name'])
     # Output options based on names
@@ -165,7 +164,7 @@ def enable_player_filter(name1, name2):
 def update_table(btn_lastseason, radio, slider, app_data):
     # Get data from session
     trigger = ctx.triggered[0]['prop_id'].split('.')[0]
-    players_df = pd.DataFrame(json.loads(app_data['players']))
+    players_df = store.load(app_data, 'players')[0]
     # Deliver desired info
     if trigger == 'btn-lastseason':
         data, styles = api.show_lastseason(players_df)
@@ -198,16 +197,14 @@ def update_scoreboard(budget, app_data):
     '''
     # Get data from session
     trigger = ctx.triggered[0]['prop_id'].split('.')[0]
-    market_df = pd.DataFrame(json.loads(app_data['market']))
-    rounds_df = pd.DataFrame(json.loads(app_data['rounds']))
-    standings_df = pd.DataFrame(json.loads(app_data['standings']))
+    ledger_df = store.load(app_data, 'ledger')[0]
     # Deliver desired info
     if trigger == 'app-data':
         show = {'display': 'block', 'margin': '1rem'}
-        data, styles = api.show_scoreboard(20*1e6, market_df, rounds_df, standings_df)
+        data, styles = api.show_scoreboard(20*1e6, ledger_df)
     elif trigger == 'scoreboard-slider':
         show = {'display': 'block', 'margin': '1rem'}
-        data, styles = api.show_scoreboard(budget*1e6, market_df, rounds_df, standings_df)
+        data, styles = api.show_scoreboard(budget*1e6, ledger_df)
     else:
         data, styles, show = no_update, no_update, no_update
     # Output
@@ -0,0 +1,204 @@
+import sys
+import weakref
+import hashlib
+import pandas as pd
+from threading import RLock
+from time import monotonic
+from collections import OrderedDict
+
+
+# ------------------------------------- Cache ----------------------------------------
+
+class LRUCache:
+    '''
+    Thread-safe in-memory cache with least-recently-used eviction. Entries
+    may also expire after a time-to-live and the cache can be capped by the
+    estimated memory footprint of its values.
+    '''
+
+    def __init__(self, maxsize=128, ttl=None, max_bytes=None, sizeof=None, sliding=False):
+        '''
+        :param maxsize: maximum number of entries kept in the cache.
+        :param ttl: seconds after which an entry expires (None to disable).
+        :param max_bytes: memory cap for all the entries (None to disable).
+        :param sizeof: function estimating the size in bytes of a value.
+        :param sliding: restart the time-to-live of an entry on every read.
+        '''
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or memory_size
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        '''
+        Returns the value stored under key and marks it as recently used.
+
+        :param key: key of the entry.
+        :param default: value returned when the key is missing or expired.
+        :return: cached value.
+        '''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires, nbytes = entry
+            if expires is not None and expires < monotonic():
+                self._remove(key)
+                return default
+            if self.sliding and self.ttl:
+                self._data[key] = (value, monotonic() + self.ttl, nbytes)
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        '''
+        Stores a value and evicts the oldest entries if any limit is exceeded.
+
+        :param key: key of the entry.
+        :param value: value to store.
+        :return: stored value.
+        '''
+        nbytes = self.sizeof(value) if self.max_bytes else 0
+        expires = monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def _remove(self, key):
+        value, _, nbytes = self._data.pop(key)
+        self.nbytes -= nbytes
+        return value
+
+    def _evict(self):
+        # Drop expired entries first, then the least recently used ones
+        if self.ttl:
+            now = monotonic()
+            for key in [k for k, (_, expires, _) in self._data.items() if expires < now]:
+                self._remove(key)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+        # Always keep the newest entry, even if it exceeds the cap by itself
+        while self.max_bytes and self.nbytes > self.max_bytes and len(self._data) > 1:
+            self._remove(next(iter(self._data)))
+
+
+# ------------------------------------- Helpers --------------------------------------
+
+def memory_size(value):
+    '''
+    Estimates the memory footprint of a value in bytes. Dataframes are
+    measured deeply and containers are measured recursively.
+
+    :param value: object to measure.
+    :return: estimated size in bytes.
+    '''
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    elif isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    elif isinstance(value, dict):
+        return sys.getsizeof(value) + sum(memory_size(v) for v in value.values())
+    elif isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(memory_size(v) for v in value)
+    else:
+        return sys.getsizeof(value)
+
+
+def frame_version(df):
+    '''
+    Computes a short content hash of a dataframe. Two frames with the same
+    columns, index and values get the same version.
+
+    :param df: dataframe to hash.
+    :return: hexadecimal digest.
+    '''
+
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df.index).values.tobytes())
+    for column in df.columns:
+        try:
+            hashed = pd.util.hash_pandas_object(df[column], index=False)
+        except TypeError:
+            # Columns holding lists (e.g. players fitness) are hashed as text
+            hashed = pd.util.hash_pandas_object(df[column].astype(str), index=False)
+        digest.update(hashed.values.tobytes())
+    return digest.hexdigest()
+
+
+# Content hash of the dataframes seen by this process, keyed by object id
+versions = dict()
+
+
+def dataset_version(df):
+    '''
+    Returns the content hash of a dataframe, computed only the first time
+    this dataframe object is seen. Session datasets are shared by
+    reference and never modified, so the hash of an object stays valid
+    for its whole life.
+
+    :param df: dataframe to identify.
+    :return: hexadecimal digest.
+    '''
+
+    key = id(df)
+    entry = versions.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    version = frame_version(df)
+    versions[key] = (weakref.ref(df, lambda _: versions.pop(key, None)), version)
+    return version
+
+
+# Dataframes held by the whole process (e.g. the players catalogue) and used
+# by many sessions at once, keyed by object id
+shared = weakref.WeakValueDictionary()
+
+
+def share(df):
+    '''
+    Marks a dataframe as shared by all the sessions of the process.
+
+    :param df: dataframe held by a process-wide cache.
+    :return: the same dataframe.
+    '''
+
+    shared[id(df)] = df
+    return df
+
+
+def is_shared(df):
+    '''
+    Tells whether a dataframe was marked as shared with share().
+
+    :param df: dataframe.
+    :return: True for process-wide dataframes.
+    '''
+
+    return shared.get(id(df)) is df
@@ -0,0 +1,106 @@
+import os
+import json
+import hashlib
+import requests
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import http_options, record_folder
+
+
+# ------------------------------------ HTTP client -----------------------------------
+
+# Process-wide session shared by all the users, so connections to the
+# Biwenger endpoints are kept alive and reused between requests and logins
+session = requests.Session()
+
+# Users are identified by the headers of each request, never by cookies
+session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+# Connection pool with retries on rate limiting and server errors
+adapter = HTTPAdapter(
+    pool_connections=http_options['pool_connections'],
+    pool_maxsize=http_options['pool_size'],
+    max_retries=Retry(
+        total=http_options['retries'],
+        backoff_factor=http_options['backoff'],
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True
+    )
+)
+session.mount('https://', adapter)
+session.mount('http://', adapter)
+
+# Folder where responses are recorded (None to disable)
+recording = dict(folder=record_folder)
+
+
+def auth_headers(token, league, user):
+    '''
+    Returns the headers identifying a user in the Biwenger API.
+
+    :param token: session token generated upon login.
+    :param league: the id of the league.
+    :param user: the id of the player.
+    :return: headers dict.
+    '''
+
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {token}',
+        'X-League': str(league),
+        'X-User': str(user)
+    }
+
+
+def get(url, **kwargs):
+    kwargs.setdefault('timeout', http_options['timeout'])
+    return session.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    kwargs.setdefault('timeout', http_options['timeout'])
+    return session.post(url, **kwargs)
+
+
+# ------------------------------------ Recording -------------------------------------
+
+def record(response, *args, **kwargs):
+    '''
+    Response hook of the shared session. When a recording folder is set,
+    successful responses are saved there as JSON files named after the
+    request, so they can be replayed offline. Request headers and bodies
+    (credentials) are not saved and login tokens are replaced.
+
+    :param response: response received by the session.
+    :return: the same response.
+    '''
+
+    folder = recording['folder']
+    if folder is None or response.status_code != 200:
+        return response
+
+    body = response.text
+    try:
+        content = json.loads(body)
+        if isinstance(content, dict) and 'token' in content:
+            body = json.dumps(dict(content, token='recorded'))
+    except ValueError:
+        pass
+
+    request = f'{response.request.method} {response.url}'
+    name = hashlib.blake2b(request.encode(), digest_size=8).hexdigest()
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, f'{name}.json'), 'w', encoding='utf-8') as file:
+        json.dump({
+            'method': response.request.method,
+            'url': response.url,
+            'headers': {key: response.headers[key] for key in ['Content-Type', 'ETag', 'Last-Modified']
+                        if key in response.headers},
+            'body': body
+        }, file)
+
+    return response
+
+
+session.hooks['response'].append(record)
@@ -10,6 +10,49 @@ url = {
     'standings': 'https://biwenger.as.com/api/v2/league?include=all&fields=*,standings,tournaments,group,settings(description)'
 }
 
+# Shared HTTP connection pool for the Biwenger endpoints
+http_options = dict(
+    pool_connections = 4,
+    pool_size = 16,
+    retries = 3,
+    backoff = 0.5,
+    timeout = 15
+)
+
+# League board paging: items per page and pages requested ahead
+paging = dict(
+    limit = 200,
+    window = 4
+)
+
+# Local store of league board items, so logins only request new items
+board_store = dict(
+    enabled = True,
+    path = './data/.cache/board.sqlite'
+)
+
+# Advanced stats database. The url defaults to the credentials in database.py,
+# the local snapshot is reloaded after 'refresh' seconds and its row count is
+# compared with the database every 'check' seconds
+advanced_options = dict(
+    url = None,
+    refresh = 24 * 3600,
+    check = 15 * 60,
+    snapshot = './data/.cache/advanced.pkl'
+)
+
+# Folder where the responses of the Biwenger endpoints are saved to be replayed
+# offline by the stand-ins in benchmarks/standin.py (None to disable)
+record_folder = None
+
+# Seconds allowed for each data source during login
+timeouts = dict(
+    market = 60,
+    players = 20,
+    advanced = 30,
+    standings = 10
+)
+
 
 # ----------------------------------- Chart ---------------------------------
 chart_titles = {
@@ -91,6 +134,9 @@ css = dict(
 
 epoch = int(mktime(strptime('10-07-2023 05:00:00', '%d-%m-%Y %H:%M:%S')))
 
+# Format and time zone of the transfer dates in the demo workbooks
+demo_dates = dict(format='%d-%m-%Y %H:%M:%S', timezone='Europe/Madrid')
+
 chart_options = dict(
     font = {'size': 16, 'family': 'system-ui', 'color': css['color_text']},
     height = 750,
@@ -100,6 +146,16 @@ chart_options = dict(
     yaxis = {'gridwidth': 1, 'gridcolor': css['color_text']}
 )
 
+# Recent form columns added to the players table: points in the last k games
+fitness_form = [3]
+
+# Player scatter plots switch to WebGL above 'webgl_points' markers and
+# leave out players under 'min_points' points (None to keep everyone)
+scatter_options = dict(
+    webgl_points = 1000,
+    min_points = None
+)
+
 advanced_stats = dict(
     keeper = [
         'games_played',
@@ -165,4 +221,35 @@ style_header = dict(
     color = css['color_text']
 )
 
-positions = ['keeper', 'defender', 'midfielder', 'forward']
\ No newline at end of file
+# Maximum number of colour bins used to highlight table cells
+color_bins = 10
+
+positions = ['keeper', 'defender', 'midfielder', 'forward']
+
+
+# ----------------------------------- Cache ---------------------------------
+
+session_options = dict(
+    server_side = True,
+    encoding = 'json',
+    max_sessions = 256,
+    ttl = 4 * 3600,
+    max_memory = 512 * 1024 ** 2,
+    decoded_memory = 256 * 1024 ** 2
+)
+
+# Rendered charts shared by all the sessions
+figure_options = dict(
+    max_figures = 256,
+    max_memory = 128 * 1024 ** 2
+)
+
+# Charts and tables prepared in the background: the demo data when the app
+# starts, and the players charts whenever a new players catalogue arrives
+warm_up_options = dict(
+    demo = True,
+    players = True
+)
+
+# Seconds before the shared players catalogue is revalidated upstream
+players_ttl = 60 * 60
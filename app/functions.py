@@ -1,19 +1,148 @@
+import os
 import json
-import requests
+import logging
+import hashlib
+import client
+import storage
+from cache import LRUCache, dataset_version, share
 import numpy as np
 import pandas as pd
 import seaborn as sns
 import sqlalchemy as db
 import plotly.express as px
 import plotly.graph_objs as go
-from time import strftime, localtime
-from database import user, server, password
+from collections import deque
+from time import monotonic, time
+from threading import Lock, Thread
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from plotly.express.colors import sample_colorscale
-from config import url, chart_options, advanced_stats
+from config import (url, chart_options, advanced_stats, timeouts, paging,
+                    board_store, players_ttl, advanced_options, color_bins,
+                    figure_options, warm_up_options, scatter_options,
+                    fitness_form, demo_dates)
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------- Schemas --------------------------------------
+
+position_codes = pd.CategoricalDtype(['keeper', 'defender', 'midfielder', 'forward', 'trainer'])
+sale_types = pd.CategoricalDtype(['market', 'transfer'])
+
+# Column types of the session datasets. Columns not listed here get the default
+# rules of apply_schema. Types are:
+# - 'members': categorical sharing its categories with the other 'members' columns
+# - 'category': categorical, or a CategoricalDtype with fixed categories
+# - 'datetime': UTC datetime
+# - 'integer': smallest integer type holding the values (nullable if values are missing)
+schemas = dict(
+    market=dict(player_id='integer', seller='members', buyer='members', amount='integer',
+                date='datetime', type=sale_types),
+    rounds=dict(round='category', member='category', points='integer', bonus='integer'),
+    players=dict(position=position_codes, status='category', teamID='integer',
+                 pointsLastSeason='integer'),
+    advanced=dict(position='category', team='category', country='category'),
+    standings=dict(points='integer', teamValue='integer', position='integer')
+)
+
+
+def apply_schema(name, df):
+    '''
+    Converts the columns of a dataset to the memory-lean types set in
+    schemas. Columns not listed there are converted by default rules:
+    integer columns get the smallest integer type holding their values and
+    text columns repeating their values get a categorical type. Other
+    columns (e.g. ratios, lists) are kept as they are.
+
+    :param name: name of the dataset (e.g. 'market').
+    :param df: dataset as read from its source.
+    :return: dataset with the new column types.
+    '''
+
+    schema = schemas.get(name, dict())
+    columns = dict()
+
+    # Columns listed in the schema
+    members = [col for col, kind in schema.items() if kind == 'members' and col in df]
+    if members:
+        names = pd.concat([df[col].astype(object) for col in members]).dropna().unique()
+        members_codes = pd.CategoricalDtype(sorted(names))
+        columns.update({col: df[col].astype(object, copy=False).astype(members_codes) for col in members})
+    for col, kind in schema.items():
+        if col not in df or kind == 'members':
+            continue
+        elif isinstance(kind, pd.CategoricalDtype):
+            columns[col] = df[col].astype(kind, copy=False)
+        elif kind == 'integer':
+            columns[col] = smallest_integer(df[col])
+        elif kind == 'datetime':
+            columns[col] = to_datetime(df[col])
+        elif kind == 'category':
+            columns[col] = df[col].astype('category')
+        else:
+            columns[col] = df[col].astype(kind)
+
+    # Default rules for the other columns
+    for col in df.columns.difference(list(schema), sort=False):
+        values = df[col]
+        if pd.api.types.is_integer_dtype(values) and not pd.api.types.is_extension_array_dtype(values):
+            columns[col] = smallest_integer(values)
+        elif values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == 'string' \
+                and values.nunique() <= len(values) / 2:
+            columns[col] = values.astype('category')
+
+    return df.assign(**columns)
+
+
+def smallest_integer(values):
+    '''
+    Converts a numeric column to the smallest integer type holding its
+    values. Columns with missing values get a nullable integer type and
+    columns with decimals are returned unchanged.
+
+    :param values: numeric series.
+    :return: converted series.
+    '''
+
+    finite = values.dropna()
+    if not pd.api.types.is_numeric_dtype(values) or (finite % 1 != 0).any():
+        return values
+    low, high = (finite.min(), finite.max()) if len(finite) else (0, 0)
+    kind = next(kind for kind in ['int8', 'int16', 'int32', 'int64']
+                if np.iinfo(kind).min <= low and high <= np.iinfo(kind).max)
+    return values.astype(kind.capitalize() if len(finite) < len(values) else kind)
+
+
+def to_datetime(values):
+    '''
+    Converts transfer dates to UTC datetimes. Dates may come as Unix
+    timestamps (Biwenger board) or as text in the local time set in
+    config.py (demo workbooks).
+
+    :param values: date series.
+    :return: UTC datetime series.
+    '''
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values if values.dt.tz is not None else values.dt.tz_localize('UTC')
+    elif pd.api.types.is_numeric_dtype(values):
+        return pd.to_datetime(values, unit='s', utc=True)
+    else:
+        dates = pd.to_datetime(values, format=demo_dates['format'])
+        dates = dates.dt.tz_localize(demo_dates['timezone'], ambiguous='NaT', nonexistent='shift_forward')
+        return dates.dt.tz_convert('UTC')
 
 
 # ------------------------------------- API ----------------------------------------
 
+class LoginError(Exception):
+    '''
+    Error during login whose message is safe to show to the user: it names
+    the failing step or data source without internal details.
+    '''
+
+
 def get_login(email, password):
     '''
     Logs in to Biwenger using the credentials set in config.py
@@ -23,126 +152,223 @@ def get_login(email, password):
     :return: session token generated upon login.
     '''
 
-    # Open HTTP session
-    with requests.Session() as session:
+    # Login with credentials
+    post = client.post(url['login'], data={'email': email, 'password': password})
+
+    # Return token
+    if post.status_code == 200:
+        return post.json()['token']
+    else:
+        raise LoginError(f'Cannot login! Status code = {post.status_code}')
 
-        # Login with credentials
-        post = session.post(url['login'], data={'email': email, 'password': password})
 
-        # Return token
-        if post.status_code == 200:
-            return session, post.json()['token']
-        else:
-            raise Exception(f'Cannot login! Status code = {post.status_code}')
+# Players catalogue shared by all the users
+players_cache = dict(df=None, etag=None, modified=None, expires=0)
+players_lock = Lock()
+
+
+def get_players():
+    '''
+    Gets all the players in the app as a table. The catalogue is the
+    same for every user, so it is requested once and shared until it
+    expires. Expired catalogues are revalidated with ETag and
+    Last-Modified, and concurrent calls wait for a single request.
 
+    :return: all the players table.
+    '''
 
-def get_players(session):
+    with players_lock:
+        cached = players_cache['df']
+        if cached is not None and monotonic() < players_cache['expires']:
+            return cached
+
+        # Ask upstream whether the catalogue changed since the last request
+        headers = dict()
+        if cached is not None and players_cache['etag']:
+            headers['If-None-Match'] = players_cache['etag']
+        if cached is not None and players_cache['modified']:
+            headers['If-Modified-Since'] = players_cache['modified']
+
+        # Get players, serving the previous catalogue if upstream fails
+        try:
+            players = client.get(url=url['players'], headers=headers)
+            if players.status_code != 304:
+                players_cache.update(
+                    df=share(parse_players(players.text)),
+                    etag=players.headers.get('ETag'),
+                    modified=players.headers.get('Last-Modified')
+                )
+                # Render the charts of the new catalogue before users ask for them
+                if warm_up_options['players']:
+                    Thread(target=warm_charts, args=(players_cache['df'],), daemon=True).start()
+        except Exception:
+            if cached is None:
+                raise
+
+        players_cache['expires'] = monotonic() + players_ttl
+        return players_cache['df']
+
+
+def parse_players(text, form=fitness_form):
     '''
-    Gets all the players in the app as a table.
+    Creates the players table from the JSONP players feed. The fitness
+    lists are read as a numeric matrix (one column per game, oldest
+    first) so recent fitness and form are computed for all the players
+    at once.
 
-    :param session: requests session created by main loop.
+    :param text: body of the players feed.
+    :param form: numbers of last games summed in 'fitness_last{k}' columns.
     :return: all the players table.
     '''
 
-    # Get players
-    players = session.get(url=url['players'])
-    players_json = json.loads(players.text.split('(', 1)[1].strip(')'))
+    # Parse the JSON inside the JSONP callback
+    players_json = json.loads(text[text.index('(') + 1:text.rindex(')')])
 
     # Create the players table
     if players_json['status'] == 200:
         # Create dataframe
-        df = pd.DataFrame.from_dict(players_json['data']['players'], orient='index')
+        players = players_json['data']['players']
+        df = pd.DataFrame(list(players.values()), index=list(players.keys()))
         df['played'] = df['playedHome'] + df['playedAway']
-        df.replace({'position': {1: 'keeper', 2: 'defender', 3: 'midfielder', 4: 'forward', 5: 'trainer'}}, inplace=True)
-        # Calculate total points for recent fitness
-        df['fitness_total'] = df['fitness'].apply(lambda x: sum([score if isinstance(score, int) else 0 for score in x]))
+        df['position'] = pd.Categorical.from_codes(df['position'].to_numpy() - 1, dtype=position_codes)
         # Drop players who did not perform
-        df.drop(labels=df[df['points'] <= 0].index, inplace=True)
-        df.drop(labels=df[df['played'] <= 0].index, inplace=True)
+        df = df.loc[(df['points'] > 0) & (df['played'] > 0)].copy()
+        # Fitness matrix: scores are numbers, other entries (e.g. injured) count as zero
+        fitness = pd.DataFrame(df['fitness'].tolist(), index=df.index)
+        fitness = fitness.apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype='int64')
+        # Calculate total points for recent fitness and form
+        df['fitness_total'] = fitness.sum(axis=1)
+        for k in form:
+            df[f'fitness_last{k}'] = fitness[:, -k:].sum(axis=1)
         # Estimate points/game and points/million
         df['points_per_game'] = df['points'] / df['played']
         df['points_per_mill'] = df['points'] / (df['price'] / 1e6)
-        return df
+        return apply_schema('players', df)
     else:
         raise Exception(f'Error getting list of players! Status code: {players_json["status"]}')
 
 
-def get_market(session, token, epoch, league, user):
+def get_market(token, epoch, league, user, window=paging['window'], incremental=board_store['enabled']):
     '''
     Gets all transfers completed from the date passed in epoch.
-    The transfer list is returned as a table.
+    The transfer list is returned as a table. Board pages are requested
+    ahead of the one being parsed, so the next pages are already on
+    their way when they are needed. In incremental mode, board items are
+    kept in a local store and only items newer than the last sync are
+    requested.
 
-    :param session: requests session created by main loop.
     :param token: session token generated upon login.
     :param epoch: date from which to collect transfers.
     :param league: the id of the league.
     :param user: the id of the player.
+    :param window: number of pages requested at the same time.
+    :param incremental: whether to sync the board with the local store.
     :return: transfers table.
     :return: round bonus table.
     '''
 
-    limit = 200
-    offset = 0
-    sales_list = list()
-    round_list = list()
-
-    # Request data until start date
-    while True:
+    limit = paging['limit']
+    since = storage.get_sync(league, epoch) if incremental else epoch
+    items = list()
 
+    def get_page(offset):
         # Get home page board
-        home = session.get(
+        home = client.get(
             url=url['market'] + f'{league}/board?offset={offset}&limit={limit}',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {token}',
-                'X-League': league,
-                'X-User': user
-            }
+            headers=client.auth_headers(token, league, user)
         )
+        return home.json()['data']
+
+    # Keep a window of pages in flight ahead of the page being parsed. Incremental
+    # syncs usually need a single page, so they only prefetch after the first one.
+    pool = ThreadPoolExecutor(max_workers=window)
+    pages = deque()
+    offset = 0
+    ahead = window if since == epoch else 1
+
+    # Request data until start date
+    try:
+        while True:
+            while len(pages) < ahead:
+                pages.append(pool.submit(get_page, offset))
+                offset += limit
+            page = pages.popleft().result()
+            ahead = window
+            news = [news for news in page if news['date'] >= since]
+            items.extend(news)
+            # Stop at the start date or at the end of the board
+            if len(news) < len(page) or len(page) < limit:
+                break
+    finally:
+        # Discard the pages requested past the start date
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Merge new items with the ones already stored
+    if incremental:
+        storage.save_board(league, since, items)
+        items = storage.get_board(league, epoch)
+
+    return parse_board(items)
+
+
+def parse_board(items):
+    '''
+    Extracts market sales, transfers and round bonuses from league
+    board items. Events are collected in column buffers and each table
+    is typed once by apply_schema, with the date as a UTC datetime and
+    the member and round names as categoricals.
 
-        # Extract market and transfer sales
-        for news in home.json()['data']:
-            if news['date'] < epoch:
-                return pd.DataFrame.from_dict(sales_list), pd.DataFrame.from_dict(round_list)
-            else:
-                if news['type'] == 'market':
-                    for event in news['content']:
-                        sales_list.append(dict(
-                            player_id=event['player'],
-                            seller='market',
-                            buyer=event['to']['name'],
-                            amount=event['amount'],
-                            date=strftime('%d-%m-%Y %H:%M:%S', localtime(news['date'])))
-                        )
-                elif news['type'] == 'transfer':
-                    for event in news['content']:
-                        sales_list.append(dict(
-                            player_id=event['player'],
-                            seller=event['from']['name'],
-                            buyer=event['to']['name'] if 'to' in event.keys() else 'market',
-                            amount=event['amount'],
-                            date=strftime('%d-%m-%Y %H:%M:%S', localtime(news['date'])))
-                        )
-                elif news['type'] == 'roundFinished':
-                    for event in news['content']['results']:
-                        round_list.append(dict(
-                            round=news['content']['round']['name'],
-                            member=event['user']['name'],
-                            points=event['points'] if 'bonus' in event.keys() else 0,
-                            bonus=event['bonus'] if 'bonus' in event.keys() else 0)
-                        )
-                else:
-                    pass
-
-        # Update offset for next request
-        offset += limit
-
-
-def get_standings(session, token, league, user):
+    :param items: board items, newest first.
+    :return: transfers table.
+    :return: round bonus table.
+    '''
+
+    sales = dict(player_id=list(), seller=list(), buyer=list(), amount=list(), date=list(), type=list())
+    rounds = dict(round=list(), member=list(), points=list(), bonus=list())
+
+    # Extract market and transfer sales
+    for news in items:
+        if news['type'] in ('market', 'transfer'):
+            for event in news['content']:
+                sales['player_id'].append(event['player'])
+                sales['seller'].append(event['from']['name'] if news['type'] == 'transfer' else 'market')
+                sales['buyer'].append(event['to']['name'] if 'to' in event else 'market')
+                sales['amount'].append(event['amount'])
+                sales['date'].append(news['date'])
+                sales['type'].append(news['type'])
+        elif news['type'] == 'roundFinished':
+            for event in news['content']['results']:
+                rounds['round'].append(news['content']['round']['name'])
+                rounds['member'].append(event['user']['name'])
+                rounds['points'].append(event['points'] if 'bonus' in event else 0)
+                rounds['bonus'].append(event['bonus'] if 'bonus' in event else 0)
+        else:
+            pass
+
+    # Raw columns, typed by the schemas (sellers and buyers share categories
+    # so member matrices stay square)
+    market_df = apply_schema('market', pd.DataFrame({
+        'player_id': np.array(sales['player_id'], dtype='int64'),
+        'seller': np.array(sales['seller'], dtype=object),
+        'buyer': np.array(sales['buyer'], dtype=object),
+        'amount': np.array(sales['amount'], dtype='int64'),
+        'date': np.array(sales['date'], dtype='int64'),
+        'type': np.array(sales['type'], dtype=object)
+    }))
+    rounds_df = apply_schema('rounds', pd.DataFrame({
+        'round': np.array(rounds['round'], dtype=object),
+        'member': np.array(rounds['member'], dtype=object),
+        'points': np.array(rounds['points'], dtype='int64'),
+        'bonus': np.array(rounds['bonus'], dtype='int64')
+    }))
+
+    return market_df, rounds_df
+
+
+def get_standings(token, league, user):
     '''
     Returns the current league standings.
 
-    :param session: requests session created by main loop.
     :param token: session token generated upon login.
     :param league: the id of the league.
     :param user: the id of the player.
@@ -150,21 +376,43 @@ def get_standings(session, token, league, user):
     '''
 
     # Get league standings
-    standings = session.get(
+    standings = client.get(
         url=url['standings'],
-        headers={
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {token}',
-            'X-League': league,
-            'X-User': user
-        }
+        headers=client.auth_headers(token, league, user)
     )
 
     # Convert to dataframe
     df = pd.DataFrame.from_dict(standings.json()['data']['standings'])
     df.drop(columns=['id', 'icon', 'lastPositions', 'role', 'lastAccess', 'lastTrophy', 'teamSize'], inplace = True)
 
-    return df
+    return apply_schema('standings', df)
+
+
+# Advanced stats database connection and table, created once per process
+advanced_db = dict(engine=None, table=None)
+# Advanced stats snapshot: dataframe, row count and load/check dates
+advanced_cache = dict(df=None, rows=None, loaded=0, checked=0)
+advanced_lock = Lock()
+
+
+def get_advanced_engine():
+    '''
+    Returns the pooled SQLAlchemy engine and the reflected 'players'
+    table of the advanced stats database, creating them on first use.
+
+    :return: engine and table.
+    '''
+
+    if advanced_db['engine'] is None:
+        database_url = advanced_options['url']
+        if database_url is None:
+            from database import user, server, password
+            database_url = f'postgresql://{user}:{password}@{server}/{user}'
+        engine = db.create_engine(url=database_url, pool_pre_ping=True)
+        table = db.Table('players', db.MetaData(), autoload_with=engine)
+        advanced_db.update(engine=engine, table=table)
+
+    return advanced_db['engine'], advanced_db['table']
 
 
 def get_advanced_stats():
@@ -172,44 +420,249 @@ def get_advanced_stats():
     Connects to a PostgreSQL database hosted in ElephantSQL and
     queries all the data from table 'players', which contains the
     advanced statistics for all the players in LaLiga. Note: this
-    table is updated weekly by the devs of this app.
+    table is updated weekly by the devs of this app, so the table is
+    kept as a local snapshot. The snapshot is downloaded again when it
+    gets old or when the row count of the table changes.
 
     :returns: dataframe containing the players stats.
     '''
 
-    # Setup SQLalchemy connection to ElephantSQL
-    engine = db.create_engine(url=f'postgresql://{user}:{password}@{server}/{user}', echo=True)
-    conn = engine.connect()
-    metadata = db.MetaData()
+    with advanced_lock:
+        # Load the snapshot saved by a previous process
+        if advanced_cache['df'] is None and os.path.exists(advanced_options['snapshot']):
+            advanced_cache.update(pd.read_pickle(advanced_options['snapshot']))
+            advanced_cache['df'] = share(apply_schema('advanced', advanced_cache['df']))
+        # Serve the snapshot while it is fresh
+        now = time()
+        cached = advanced_cache['df']
+        if cached is not None and now - advanced_cache['loaded'] < advanced_options['refresh'] \
+                and now - advanced_cache['checked'] < advanced_options['check']:
+            return cached
+
+        try:
+            engine, players_table = get_advanced_engine()
+            with engine.connect() as conn:
+                # Cheap check before transferring the whole table
+                rows = conn.execute(db.select(db.func.count()).select_from(players_table)).scalar()
+                if cached is not None and rows == advanced_cache['rows'] \
+                        and now - advanced_cache['loaded'] < advanced_options['refresh']:
+                    advanced_cache['checked'] = now
+                    return cached
+                # Query table
+                players_data = conn.execute(players_table.select()).fetchall()
+        except Exception:
+            # Serve the previous snapshot if the database is not available
+            if cached is None:
+                raise
+            return cached
+
+        players_df = share(apply_schema('advanced', pd.DataFrame(players_data)))
+        advanced_cache.update(df=players_df, rows=rows, loaded=now, checked=now)
+        # Save the snapshot for other processes
+        os.makedirs(os.path.dirname(advanced_options['snapshot']), exist_ok=True)
+        pd.to_pickle(dict(advanced_cache), advanced_options['snapshot'] + '.tmp')
+        os.replace(advanced_options['snapshot'] + '.tmp', advanced_options['snapshot'])
 
-    # Query table
-    players_table = db.Table('players', metadata, autoload_with=engine)
-    players_data = conn.execute(players_table.select()).fetchall()
-    players_df = pd.DataFrame(players_data)
+    return players_df
 
-    # Close connection
-    conn.close()
-    engine.dispose()
 
-    return players_df
+def get_league_data(token, epoch, league, user):
+    '''
+    Requests the market, players, advanced stats and standings data at the
+    same time, since the sources are independent. Each source must finish
+    within the time set for it in config.py, and the first source that
+    fails is reported as soon as it fails.
+
+    :param token: session token generated upon login.
+    :param epoch: date from which to collect transfers.
+    :param league: the id of the league.
+    :param user: the id of the player.
+    :return: dict with the market, rounds, players, advanced and standings dataframes.
+    '''
+
+    sources = dict(
+        market=(get_market, (token, epoch, league, user)),
+        players=(get_players, ()),
+        advanced=(get_advanced_stats, ()),
+        standings=(get_standings, (token, league, user))
+    )
+
+    # Request all sources in parallel
+    pool = ThreadPoolExecutor(max_workers=len(sources))
+    futures = {name: pool.submit(function, *args) for name, (function, args) in sources.items()}
+    start = monotonic()
+
+    # Collect results as they arrive, reporting the first source that fails.
+    # Details of the error are only logged, since they may describe the servers.
+    try:
+        results = dict()
+        pending = {future: name for name, future in futures.items()}
+        while pending:
+            deadline = min(start + timeouts[name] for name in pending.values())
+            done, _ = wait(pending, timeout=max(0, deadline - monotonic()), return_when=FIRST_EXCEPTION)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    logger.exception(f'Error loading {name} data')
+                    raise LoginError(f'Could not load {name} data')
+            for name in pending.values():
+                if monotonic() >= start + timeouts[name]:
+                    logger.error(f'Timed out loading {name} data')
+                    raise LoginError(f'Timed out loading {name} data')
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    results['market'], results['rounds'] = results['market']
+    return results
+
+
+# Demo dataframes loaded in this process, keyed by name
+demo_frames = dict()
+demo_lock = Lock()
+
+
+def get_demo(name, folder='./data'):
+    '''
+    Returns one of the demo datasets stored as Excel workbooks. The first
+    read of a workbook is converted to a pickle in folder/.cache named
+    after the hash of the workbook, so later reads skip the slow Excel
+    parser. Frames are kept in memory for the whole process, with the
+    column types of the live datasets, and reloaded when the workbook
+    changes.
+
+    :param name: name of the dataset (e.g. 'market').
+    :param folder: folder containing the workbooks.
+    :return: dataset as a dataframe.
+    '''
+
+    source = os.path.join(folder, f'{name}.xlsx')
+    mtime = os.stat(source).st_mtime_ns
+
+    with demo_lock:
+        # Reuse the frame loaded by this process unless the workbook changed
+        if name in demo_frames and demo_frames[name][0] == mtime:
+            return demo_frames[name][1]
+        # Look for a conversion of this exact workbook content
+        with open(source, 'rb') as file:
+            digest = hashlib.sha256(file.read()).hexdigest()[:16]
+        cache = os.path.join(folder, '.cache')
+        cached = os.path.join(cache, f'{name}-{digest}.pkl')
+        if os.path.exists(cached):
+            df = pd.read_pickle(cached)
+        else:
+            df = pd.read_excel(source)
+            os.makedirs(cache, exist_ok=True)
+            # Remove conversions of previous versions of the workbook
+            for file in os.listdir(cache):
+                if file.startswith(f'{name}-') and file.endswith('.pkl'):
+                    os.remove(os.path.join(cache, file))
+            df.to_pickle(cached + '.tmp')
+            os.replace(cached + '.tmp', cached)
+        df = share(apply_schema(name, df))
+        demo_frames[name] = (mtime, df)
+
+    return df
+
+
+def warm_charts(players_df):
+    '''
+    Renders the charts built from the players catalogue, which are the
+    same for every user, so they are served from the figure cache.
+
+    :param players_df: players dataframe.
+    '''
+
+    for chart in [plot_player_efficiency, plot_recent_fitness]:
+        get_figure(chart, players_df)
+
+
+def warm_up():
+    '''
+    Prepares the demo data, its charts and scoreboard ledger, and the
+    charts of the live players catalogue, so that the first clicks after
+    the app starts are served from cache. Warm-up is best effort: any
+    chart that fails here is logged and rendered on demand instead.
+    '''
+
+    if warm_up_options['demo']:
+        try:
+            demo = {name: get_demo(name) for name in ['market', 'rounds', 'players', 'advanced', 'standings']}
+            get_ledger(demo['market'], demo['rounds'], demo['standings'])
+            get_figure(plot_links, demo['market'])
+            warm_charts(demo['players'])
+        except Exception:
+            logger.exception('Could not warm up the demo data')
+
+    # A new catalogue warms its charts from get_players
+    if warm_up_options['players']:
+        try:
+            get_players()
+        except Exception:
+            logger.exception('Could not warm up the players catalogue')
 
 
 # ----------------------------- Data analysis --------------------------------------
 
-def plot_player_efficiency(players_df):
+# Rendered figures as JSON, keyed by chart, dataset version and parameters
+figures = LRUCache(maxsize=figure_options['max_figures'], max_bytes=figure_options['max_memory'])
+
+
+def get_figure(chart, df, *args):
+    '''
+    Returns a chart as a figure dict, rendering it only the first time it
+    is requested for a dataset and set of parameters. Sessions with the
+    same data (e.g. the players catalogue) share the rendered figure.
+
+    :param chart: plotting function from this module (e.g. plot_links).
+    :param df: dataframe passed to the plotting function.
+    :param args: other parameters of the plotting function.
+    :return: figure dict.
+    '''
+
+    key = (chart.__name__, dataset_version(df), args)
+    figure = figures.get(key)
+    if figure is None:
+        figure = figures.set(key, chart(df, *args).to_json())
+
+    return json.loads(figure)
+
+
+def scatter_data(players_df, highlight=()):
+    '''
+    Selects the players drawn in the player scatter plots and the render
+    mode for them. Players under the points threshold set in config.py
+    are left out unless highlighted, and large plots are drawn with
+    WebGL instead of SVG.
+
+    :param players_df: players dataframe.
+    :param highlight: names of players that are always drawn.
+    :return: players to draw and plotly render mode.
+    '''
+
+    df = players_df
+    if scatter_options['min_points'] is not None:
+        df = df.loc[(df['points'] >= scatter_options['min_points']) | df['name'].isin(highlight)]
+    render_mode = 'webgl' if len(df) > scatter_options['webgl_points'] else 'svg'
+    return df, render_mode
+
+
+def plot_player_efficiency(players_df, highlight=()):
     '''
     Plots a scatter plot with the effiency of the players.
 
     :param players_df: players dataframe.
+    :param highlight: names of players that are always drawn.
     :return: scatter plot.
     '''
 
-    # Process data
-    df = players_df.copy()
+    # Process data: plotly only reads the columns it needs
+    df, render_mode = scatter_data(players_df, highlight)
     # Create figure
     fig = px.scatter(
         data_frame=df, x='points_per_game', y='points_per_mill',
-        size='points', color='position', hover_name='name',
+        size='points', color='position', hover_name='name', render_mode=render_mode,
         labels={
             'points_per_game': 'Points per game',
             'points_per_mill': 'Points per million',
@@ -232,10 +685,8 @@ def plot_links(market_df):
     :param market_df: market dataframe
     :return: sankey diagram.
     '''
-    # Process data
-    df = market_df.copy()
     # Get transactions between league members
-    grouped = df.groupby(by=['seller', 'buyer'], dropna=False)
+    grouped = market_df.groupby(by=['seller', 'buyer'], dropna=False, observed=False)
     grouped = grouped.player_id.count().unstack(fill_value=0)
     # Drop market transactions
     grouped.drop(labels='market', axis=0, inplace=True)
@@ -263,20 +714,21 @@ def plot_links(market_df):
     return fig
 
 
-def plot_recent_fitness(players_df):
+def plot_recent_fitness(players_df, highlight=()):
     '''
     Plots a scatter plot with the recent fitness of the players.
 
     :param players_df: players dataframe.
+    :param highlight: names of players that are always drawn.
     :return: scatter plot with recent fitness.
     '''
 
-    # Process data
-    df = players_df.copy()
+    # Process data: plotly only reads the columns it needs
+    df, render_mode = scatter_data(players_df, highlight)
     # Create figure
     fig = px.scatter(
         data_frame=df, x='fitness_total', y='price',
-        size='points', color='position', hover_name='name',
+        size='points', color='position', hover_name='name', render_mode=render_mode,
         labels={'position': 'Position', 'fitness': 'fitness_total'})
     # Update layout
     fig.update_layout(
@@ -286,51 +738,152 @@ def plot_recent_fitness(players_df):
     return fig
 
 
-def plot_advanced(advanced_df, name1, name2):
+# Maximum of every advanced stat per position, keyed by dataset version
+advanced_maxima = LRUCache(maxsize=8)
+
+
+def get_advanced_maxima(advanced_df):
+    '''
+    Computes the maximum value of the advanced stats of each position,
+    once per advanced stats dataset.
+
+    :param advanced_df: advanced stats dataframe from La Liga.
+    :return: dataframe with positions as index and stats as columns.
+    '''
+
+    version = dataset_version(advanced_df)
+    maxima = advanced_maxima.get(version)
+    if maxima is None:
+        stats = list(dict.fromkeys(stat for position in advanced_stats.values() for stat in position))
+        maxima = advanced_maxima.set(version, advanced_df.groupby('position', observed=True)[stats].max())
+
+    return maxima
+
+
+def plot_advanced(advanced_df, names):
     '''
-    Plots a radar chart displaying advanced statistics of two players
+    Plots a radar chart displaying advanced statistics of the players
     whose names are provided as input parameters. The statistics are
-    selected based on the position of the two players.
+    selected based on the position of the first player and every axis
+    is scaled by the best value among the players of that position.
 
     :param advanced_df: advanced stats dataframe from La Liga.
-    :param name1: name of player 1.
-    :param name2: name of player 2.
+    :param names: names of the players to compare.
     :return: radar plot.
     '''
 
-    # Process data
-    df = advanced_df.copy()
-    pos = df.loc[df['name'] == name1]['position'].values[0]
+    # Process data: only the rows and columns of the selected players
+    pos = advanced_df.loc[advanced_df['name'] == names[0], 'position'].values[0]
     stats = advanced_stats[pos]
-    df = df.loc[df['name'].isin([name1, name2])][['name', 'position'] + stats]
+    df = advanced_df.loc[advanced_df['name'].isin(names), ['name'] + stats].drop_duplicates('name').set_index('name')
+    # One trace per player, in the order of the names given
+    df = df.reindex([name for name in dict.fromkeys(names) if name in df.index]).reset_index()
     # Chart ranges
-    ranges = list(df[stats].max().values)
+    ranges = get_advanced_maxima(advanced_df).loc[pos, stats]
     metrics = [x.replace('_', ' ').capitalize() for x in stats]
     labels = [metric_i + f' ({range_i})' for metric_i, range_i in zip(metrics, ranges)]
-    # Loop players to plot
+    # Scale all plot axis so the chart is interpretable
+    scaled = (df[stats] / ranges.where(ranges != 0)).fillna(0).round(2).to_numpy()
+    # Plot players
     fig = go.Figure()
-    for index in range(len(df)):
-        # Scale all plot axis so the chart is interpretable
-        values = list(df.iloc[index][stats])
-        scaled = [round(value_i / range_i, 2) if range_i != 0 else range_i for value_i, range_i in zip(values, ranges)]
-        # Plot player
+    for name, values in zip(df['name'], scaled):
         fig.add_trace(go.Scatterpolar(
-            r=scaled,
+            r=values,
             theta=labels,
-            fill='tonext',
-            name=df.iloc[index]['name']
+            fill='toself',
+            name=name
             )
         )
     fig.update_layout(
         title={'text': 'Advanced player statistics', 'x': 0.5, 'y': 0.95},
         polar=dict(bgcolor = chart_options['paper_bgcolor'], radialaxis={'visible': True, 'range': [0, 1]}),
-        showlegend=False,
+        showlegend=len(df) > 2,
         **chart_options
     )
 
     return fig
 
 
+# Players indexed by position and price, keyed by dataset version
+players_index = LRUCache(maxsize=32)
+# Row numbers of top-N queries, keyed by dataset version and query
+rankings = LRUCache(maxsize=1024)
+
+
+def get_players_index(players_df):
+    '''
+    Indexes the players of each position by price, so the players in a
+    price range are found with a binary search. The index is built once
+    per players dataset. Metric columns are added to the index the first
+    time they are ranked.
+
+    :param players_df: players df.
+    :return: dict with the sorted prices and row numbers of each position
+             (None for all the players) and the metric values.
+    '''
+
+    version = dataset_version(players_df)
+    index = players_index.get(version)
+    if index is None:
+        price = players_df['price'].to_numpy(dtype=float)
+        rows = np.argsort(price, kind='stable')
+        index = dict(positions={None: (price[rows], rows)}, metrics=dict())
+        for position, rows in players_df.groupby('position', sort=False, observed=True).indices.items():
+            rows = rows[np.argsort(price[rows], kind='stable')]
+            index['positions'][position] = (price[rows], rows)
+        players_index.set(version, index)
+
+    return index
+
+
+def top_players(players_df, metric, N=10, position=None, bounds=None):
+    '''
+    Returns the N players with the highest value of a metric, optionally
+    filtered by position and price. Only the best N players are sorted.
+    Players without a value go last and ties keep the order of the
+    players table. Results are cached per dataset and query.
+
+    :param players_df: players df.
+    :param metric: column to rank by (e.g. 'points_per_game', 'points_per_mill',
+                   'fitness_total', 'pointsLastSeason').
+    :param N: number of players to return.
+    :param position: position to compare (None for all the players).
+    :param bounds: price bounds in millions (None for any price).
+    :return: dataframe with the top players, best first.
+    '''
+
+    key = (dataset_version(players_df), metric, N, position, tuple(bounds) if bounds else None)
+    top = rankings.get(key)
+
+    if top is None:
+        index = get_players_index(players_df)
+        if metric not in index['metrics']:
+            index['metrics'][metric] = players_df[metric].to_numpy(dtype=float, na_value=np.nan)
+
+        # Segment data: players of the position within the price bounds
+        price, rows = index['positions'].get(position, (np.empty(0), np.empty(0, dtype=int)))
+        if bounds:
+            start = np.searchsorted(price, bounds[0]*1e6, side='left')
+            end = np.searchsorted(price, bounds[1]*1e6, side='right')
+            rows = rows[start:end]
+
+        # Select the top N without sorting the whole range
+        values = index['metrics'][metric][rows]
+        score = np.where(np.isnan(values), -np.inf, values)
+        if N <= 0:
+            selected = np.empty(0, dtype=int)
+        elif len(score) > N:
+            selected = np.argpartition(-score, N - 1)[:N]
+            # Include every player tied with the last selected one before ordering
+            selected = np.flatnonzero(score >= score[selected].min())
+        else:
+            selected = np.arange(len(score))
+        selected = selected[np.lexsort((rows[selected], -score[selected]))][:N]
+        top = rankings.set(key, rows[selected])
+
+    return players_df.iloc[top]
+
+
 def show_lastseason(players_df, position='forward', bounds=[0, 100], N=10):
     '''
     Returns the list of players who performed best during last season.
@@ -343,15 +896,10 @@ def show_lastseason(players_df, position='forward', bounds=[0, 100], N=10):
     '''
 
     # Columns to keep
-    cols = ['name', 'position', 'status', 'price', 'pointsLastSeason']
-    df = players_df[cols].copy()
+    cols = ['name', 'status', 'price', 'pointsLastSeason']
 
     # Segment data
-    df_pos = df.loc[(df['position'] == position) & (bounds[0]*1e6 <= df['price']) & (df['price'] <= bounds[1]*1e6)]
-    df_pos = df_pos.sort_values(by=['pointsLastSeason'], ascending=False)
-    df_pos.drop(labels='position', axis=1, inplace=True)
-    df_pos.reset_index(drop=True, inplace=True)
-    df_pos_top = df_pos.loc[0:N-1]
+    df_pos_top = top_players(players_df, 'pointsLastSeason', N, position, bounds)[cols].reset_index(drop=True)
 
     # Get table styles
     styles = show_background_colors(df=df_pos_top, columns=['pointsLastSeason'])
@@ -359,85 +907,118 @@ def show_lastseason(players_df, position='forward', bounds=[0, 100], N=10):
     return df_pos_top.to_dict('records'), styles
 
 
-def show_scoreboard(initial_budget, market_df, rounds_df, standings_df):
+# Ledgers keyed by the versions of the datasets they summarize
+ledgers = LRUCache(maxsize=64)
+
+
+def get_ledger(market_df, rounds_df, standings_df):
     '''
-    Creates a table showing the economic balance and current poitns of the
-    league members.
+    Summarizes the money spent on purchases and earned with sales and
+    round bonuses by each league member. The ledger only depends on the
+    league history, so it is built once per league data and reused for
+    any initial budget.
 
-    :param initial_budget: initial budget in (€) millions set by the league.
     :param market_df: market dataframe.
     :param rounds_df: rounds dataframe.
     :param standings_df: standings dataframe.
+    :return: standings dataframe with purchases, sales and bonuses columns.
+    '''
+
+    key = tuple(dataset_version(df) for df in [market_df, rounds_df, standings_df])
+    df = ledgers.get(key)
+    if df is not None:
+        return df
+
+    # Amounts per member
+    empty = pd.Series(dtype=float)
+    flows = pd.concat({
+        'purchases': market_df.groupby('buyer', observed=True)['amount'].sum() if not market_df.empty else empty,
+        'sales': market_df.groupby('seller', observed=True)['amount'].sum() if not market_df.empty else empty,
+        'bonuses': rounds_df.groupby('member', observed=True)['bonus'].sum() if not rounds_df.empty else empty
+    }, axis=1)
+    # Join amounts onto the standings
+    df = standings_df.join(flows, on='name')
+    df[list(flows.columns)] = df[list(flows.columns)].fillna(0)
+
+    return ledgers.set(key, df)
+
+
+def show_scoreboard(initial_budget, ledger_df):
+    '''
+    Creates a table showing the economic balance and current poitns of the
+    league members.
+
+    :param initial_budget: initial budget in (€) millions set by the league.
+    :param ledger_df: ledger dataframe created by get_ledger.
     :return: data to show in the table as a dict.
     '''
 
     # Prepare output
-    df = standings_df.copy()
-    df.insert(loc=standings_df.shape[1], column='balance', value=[initial_budget]*len(standings_df))
-    # Extract sells and buys
-    if not market_df.empty:
-        sell_df = market_df.groupby('seller')['amount'].sum().reset_index()
-        buy_df = market_df.groupby('buyer')['amount'].sum().reset_index()
-        # Update balance
-        df['balance'] -= df.apply(lambda x: buy_df.loc[buy_df['buyer'] == x['name']]['amount'].values[0]
-                                            if x['name'] in buy_df['buyer'].to_list() else 0, axis=1)
-        df['balance'] += df.apply(lambda x: sell_df.loc[sell_df['seller'] == x['name']]['amount'].values[0]
-                                            if x['name'] in sell_df['seller'].to_list() else 0, axis=1)
-    # Extract bonuses
-    if not rounds_df.empty:
-        bonus_df = rounds_df.groupby('member', as_index=False)['bonus'].sum()
-        # Update balance
-        df['balance'] += df.apply(lambda x: bonus_df.loc[bonus_df['member'] == x['name']]['bonus'].values[0]
-                                  if x['name'] in bonus_df['member'].to_list() else 0, axis=1)
+    df = ledger_df.drop(columns=['purchases', 'sales', 'bonuses'])
+    # Update balance
+    df['balance'] = initial_budget + (ledger_df['sales'] + ledger_df['bonuses'] - ledger_df['purchases'])
     # Get color scale for the balance column
     styles = show_background_colors(df=df, columns=['balance'])
 
     return df.to_dict('records'), styles
 
 
-def show_background_colors(df, columns):
+def show_background_colors(df, columns, bins=color_bins):
     '''
     Colors each cell in the table according to their value. This
-    function was copied from the plotly official documentation:
+    function is based on the plotly official documentation:
     https://dash.plotly.com/datatable/conditional-formatting
     #highlighting-cells-by-value-with-a-colorscale-like-a-heatmap
 
+    Cells are grouped in at most 'bins' quantile bins and the bin of
+    each cell is computed here, so the table receives one rule per
+    non-empty bin and column instead of one per row.
+
     :param df: dataframe containing the table info.
     :param columns: columns to apply the coloring.
+    :param bins: maximum number of colors.
     :return: style to apply to the dash table.
     '''
 
     # Segment data
-    df_use = df[columns]
-
-    # Select colors from scale
-    sample = np.linspace(0, 1, len(df) + 1)
-    colors = list(reversed(sample_colorscale(colorscale='Greens', samplepoints=list(sample))))
-    bounds = np.linspace(0, 1, len(df) + 1)
-
-    # Define ranges
-    df_max = df_use.max().max()
-    df_min = df_use.min().min()
-    ranges = [((df_max - df_min) * i) + df_min for i in bounds]
+    values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+    finite = values[~np.isnan(values)]
+    if finite.size == 0:
+        return list()
+
+    # Quantile bin of every cell
+    edges = np.unique(np.quantile(finite, np.linspace(0, 1, min(bins, finite.size) + 1)))
+    cells = np.searchsorted(edges[1:-1], values, side='right')
+    colors = bin_colors(max(len(edges) - 1, 1))
     styles = list()
 
-    # Assign colors to cell
-    for i in range(1, len(bounds)):
-        min_bound = ranges[i - 1]
-        max_bound = ranges[i]
-        backgroundColor = colors[i - 1]
-        color = 'inherit' if i > len(bounds) / 2. else 'white'
-        for column in df_use:
+    # Assign colors to the cells of each bin
+    for index, column in enumerate(columns):
+        for i, backgroundColor in enumerate(colors):
+            in_bin = values[(cells[:, index] == i) & ~np.isnan(values[:, index]), index]
+            if in_bin.size == 0:
+                continue
             styles.append({
                 'if': {
-                    'filter_query': (
-                        '{{{column}}} >= {min_bound}' +
-                        (' && {{{column}}} < {max_bound}' if (i < len(bounds) - 1) else '')
-                    ).format(column=column, min_bound=min_bound, max_bound=max_bound),
+                    'filter_query': '{{{column}}} >= {min_bound} && {{{column}}} <= {max_bound}'.format(
+                        column=column, min_bound=in_bin.min(), max_bound=in_bin.max()),
                     'column_id': column
                 },
                 'backgroundColor': backgroundColor,
-                'color': color
+                'color': 'white' if i + 1 <= (len(colors) + 1) / 2. else 'inherit'
             })
 
-    return styles
\ No newline at end of file
+    return styles
+
+
+@lru_cache(maxsize=None)
+def bin_colors(bins):
+    '''
+    Samples the Greens colorscale, darkest color first.
+
+    :param bins: number of colors.
+    :return: tuple of colors.
+    '''
+
+    sample = np.linspace(0, 1, bins + 1)
+    return tuple(reversed(sample_colorscale(colorscale='Greens', samplepoints=list(sample))))[:bins]
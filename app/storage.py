@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import hashlib
+from contextlib import closing
+from config import board_store
+
+
+# ---------------------------------- League board ---------------------------------
+
+def connect(path=None):
+    '''
+    Opens the local board store, creating its tables on first use.
+
+    :param path: path of the SQLite database (defaults to the one in config.py).
+    :return: SQLite connection.
+    '''
+
+    path = path or board_store['path']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript(
+        '''
+        CREATE TABLE IF NOT EXISTS board (
+            league TEXT NOT NULL,
+            date INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            content TEXT NOT NULL,
+            PRIMARY KEY (league, date, type, hash)
+        );
+        CREATE TABLE IF NOT EXISTS syncs (
+            league TEXT PRIMARY KEY,
+            since INTEGER NOT NULL
+        );
+        '''
+    )
+    return conn
+
+
+def get_sync(league, epoch, path=None):
+    '''
+    Returns the date from which the board of a league must be requested
+    to complete the local store. The store is only reused when it covers
+    every item since epoch.
+
+    :param league: the id of the league.
+    :param epoch: date from which transfers are needed.
+    :param path: path of the SQLite database.
+    :return: date of the newest stored item, or epoch when a full sync is needed.
+    '''
+
+    with closing(connect(path)) as conn:
+        sync = conn.execute('SELECT since FROM syncs WHERE league = ?', (str(league),)).fetchone()
+        if sync is None or sync[0] > epoch:
+            return epoch
+        latest = conn.execute('SELECT MAX(date) FROM board WHERE league = ?', (str(league),)).fetchone()[0]
+        return max(epoch, latest) if latest is not None else epoch
+
+
+def save_board(league, since, items, path=None):
+    '''
+    Stores board items of a league. Items already stored are ignored.
+
+    :param league: the id of the league.
+    :param since: date from which the board was requested.
+    :param items: board items, newest first.
+    :param path: path of the SQLite database.
+    '''
+
+    rows = list()
+    for news in items:
+        content = json.dumps(news['content'], sort_keys=True)
+        digest = hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+        rows.append((str(league), news['date'], news['type'], digest, content))
+
+    with closing(connect(path)) as conn, conn:
+        conn.executemany('INSERT OR IGNORE INTO board VALUES (?, ?, ?, ?, ?)', rows)
+        # Keep the oldest date covered without gaps
+        conn.execute(
+            '''
+            INSERT INTO syncs VALUES (?, ?)
+            ON CONFLICT (league) DO UPDATE SET since = MIN(since, excluded.since)
+            ''',
+            (str(league), since)
+        )
+
+
+def get_board(league, epoch, path=None):
+    '''
+    Returns the stored board items of a league from the date passed in
+    epoch, newest first as served by Biwenger.
+
+    :param league: the id of the league.
+    :param epoch: date from which to return items.
+    :param path: path of the SQLite database.
+    :return: list of board items.
+    '''
+
+    with closing(connect(path)) as conn:
+        rows = conn.execute(
+            'SELECT date, type, content FROM board WHERE league = ? AND date >= ? ORDER BY date DESC, rowid',
+            (str(league), epoch)
+        ).fetchall()
+    return [{'date': date, 'type': kind, 'content': json.loads(content)} for date, kind, content in rows]
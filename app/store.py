@@ -0,0 +1,152 @@
+import io
+import json
+import uuid
+import base64
+import hashlib
+import pandas as pd
+from cache import LRUCache, memory_size, is_shared
+from config import session_options
+from dash.exceptions import PreventUpdate
+
+
+# ---------------------------------- Sessions --------------------------------------
+
+def session_size(datasets):
+    '''
+    Estimates the memory held by a session. Dataframes shared with other
+    sessions (players catalogue, advanced stats, demo data) are not
+    counted, since evicting the session does not release them.
+
+    :param datasets: dict mapping dataset names to dataframes.
+    :return: estimated size in bytes.
+    '''
+
+    return sum(memory_size(df) for df in datasets.values() if not is_shared(df))
+
+
+# Server-side session data, keyed by the token kept in the 'app-data' store
+sessions = LRUCache(
+    maxsize=session_options['max_sessions'],
+    ttl=session_options['ttl'],
+    max_bytes=session_options['max_memory'],
+    sizeof=session_size,
+    sliding=True
+)
+
+# Dataframes decoded from browser-side payloads, keyed by their content hash
+decoded = LRUCache(
+    maxsize=4 * session_options['max_sessions'],
+    max_bytes=session_options['decoded_memory']
+)
+
+
+def save(datasets):
+    '''
+    Prepares the session dataframes for the 'app-data' store. With
+    server-side sessions the frames stay in server memory and only a
+    token is sent to the browser. Otherwise every frame is encoded with
+    the format set in session_options['encoding'].
+
+    :param datasets: dict mapping dataset names to dataframes.
+    :return: app data payload for dcc.Store(id='app-data').
+    '''
+
+    if session_options['server_side']:
+        token = uuid.uuid4().hex
+        sessions.set(token, dict(datasets))
+        return {'session': token}
+    else:
+        return {name: encode(df, session_options['encoding']) for name, df in datasets.items()}
+
+
+def load(app_data, *names):
+    '''
+    Returns the dataframes of a session in the order in which their names
+    are requested. Only the requested datasets are decoded and decoded
+    frames are reused while their payload does not change. Callbacks are
+    not updated when a server-side session has expired.
+
+    :param app_data: payload stored in dcc.Store(id='app-data').
+    :param names: names of the datasets to return.
+    :return: list of dataframes.
+    '''
+
+    if not app_data:
+        raise PreventUpdate
+    elif 'session' in app_data:
+        datasets = sessions.get(app_data['session'])
+        if datasets is None:
+            raise PreventUpdate
+        return [datasets[name] for name in names]
+    else:
+        return [decode(app_data[name]) for name in names]
+
+
+# ---------------------------------- Encoding --------------------------------------
+
+def encode(df, encoding='json'):
+    '''
+    Encodes a dataframe as a string for the 'app-data' store.
+
+    - json: pandas default JSON, dtypes are not preserved.
+    - parquet: base64 Parquet file, compact and dtype-preserving (needs pyarrow).
+      Nested values such as lists are kept as JSON text.
+
+    :param df: dataframe to encode.
+    :param encoding: 'json' or 'parquet'.
+    :return: encoded dataset.
+    '''
+
+    if encoding == 'json':
+        return df.to_json() if not df.empty else '{}'
+    elif encoding == 'parquet':
+        # Parquet columns hold a single type, so nested values (e.g. fitness lists
+        # mixing points with 'injured') are stored as JSON text and mixed object
+        # columns as text
+        text = dict()
+        for col in df.select_dtypes(object):
+            types = set(df[col].dropna().map(type))
+            if types & {list, tuple, dict}:
+                text[col] = df[col].map(lambda value: json.dumps(value, default=str), na_action='ignore')
+            elif len(types) > 1:
+                text[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        df = df.assign(**text)
+        # and so are the categories of mixed categorical columns
+        mixed = [col for col in df.select_dtypes('category') if df[col].cat.categories.map(type).nunique() > 1]
+        df = df.assign(**{col: df[col].cat.rename_categories(df[col].cat.categories.astype(str)) for col in mixed})
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, compression='zstd')
+        return 'parquet:' + base64.b64encode(buffer.getvalue()).decode('ascii')
+    else:
+        raise Exception(f'Unknown app data encoding: {encoding}')
+
+
+def parse(payload):
+    '''
+    Decodes a dataset encoded with encode(). The format is detected from
+    the payload itself.
+
+    :param payload: encoded dataset.
+    :return: dataframe.
+    '''
+
+    if payload.startswith('parquet:'):
+        return pd.read_parquet(io.BytesIO(base64.b64decode(payload[len('parquet:'):])))
+    else:
+        return pd.DataFrame(json.loads(payload))
+
+
+def decode(payload):
+    '''
+    Decodes a dataset from the 'app-data' store. Results are memoized by
+    the hash of the payload so repeated callbacks skip the parsing.
+
+    :param payload: encoded dataset.
+    :return: dataframe.
+    '''
+
+    key = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    df = decoded.get(key)
+    if df is None:
+        df = decoded.set(key, parse(payload))
+    return df
@@ -0,0 +1,39 @@
+import os
+import sys
+from time import perf_counter
+
+# Make the app modules importable and resolve ./data like the app does
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'app'))
+os.chdir(ROOT)
+
+
+def measure(function, *args, repeat=5, **kwargs):
+    '''
+    Runs a function several times and returns the best wall time.
+
+    :param function: function to time.
+    :param repeat: number of runs.
+    :return: best time in seconds and the result of the last run.
+    '''
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, perf_counter() - start)
+    return best, result
+
+
+def report(rows, columns):
+    '''
+    Prints benchmark results as an aligned table.
+
+    :param rows: list of dicts with the results.
+    :param columns: keys of the dicts to print (missing keys are left blank).
+    '''
+
+    widths = [max(len(col), *(len(str(row.get(col, ''))) for row in rows)) for col in columns]
+    print('  '.join(col.ljust(w) for col, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(str(row.get(col, '')).ljust(w) for col, w in zip(columns, widths)))
@@ -0,0 +1,61 @@
+'''
+Compares two result files of benchmarks/suite.py, for example the results
+of two commits. Cases that got slower or used more memory than the
+threshold, failed in the new results or are missing from them are marked
+and make the script exit with an error. Run from the repository root:
+
+    python benchmarks/compare.py old.json new.json [--threshold 1.2]
+'''
+import sys
+import json
+import argparse
+import common
+
+parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+parser.add_argument('old', help='results of the reference commit')
+parser.add_argument('new', help='results of the commit to check')
+parser.add_argument('--threshold', type=float, default=1.2, help='ratio above which a case is a regression')
+args = parser.parse_args()
+
+results = list()
+for path in [args.old, args.new]:
+    with open(path) as file:
+        results.append(json.load(file))
+old, new = ({(row['group'], row['case'], row['scale']): row for row in result['results']} for result in results)
+
+
+def ratio(before, after):
+    # Times under 1 ms and allocations under 1 MB are too small to compare
+    if before is None or after is None:
+        return None
+    return round(max(after, 1) / max(before, 1), 2)
+
+
+rows = list()
+for key, before in old.items():
+    # Cases of the reference commit that the new results lack
+    if key not in new:
+        rows.append(dict(
+            group=key[0], case=key[1], scale=key[2],
+            old_ms=before.get('time_ms', ''), new_ms='', time='',
+            old_mb=before.get('peak_mb', ''), new_mb='', memory='',
+            status='MISSING'
+        ))
+
+for key, after in new.items():
+    before = old.get(key)
+    if before is None:
+        continue
+    time_ratio = ratio(before.get('time_ms'), after.get('time_ms'))
+    peak_ratio = ratio(before.get('peak_mb'), after.get('peak_mb'))
+    regression = any(value is not None and value > args.threshold for value in [time_ratio, peak_ratio])
+    rows.append(dict(
+        group=key[0], case=key[1], scale=key[2],
+        old_ms=before.get('time_ms', ''), new_ms=after.get('time_ms', ''), time=time_ratio or '',
+        old_mb=before.get('peak_mb', ''), new_mb=after.get('peak_mb', ''), memory=peak_ratio or '',
+        status='ERROR' if 'error' in after else ('REGRESSION' if regression else '')
+    ))
+
+print(f'{results[0].get("commit")} -> {results[1].get("commit")}')
+common.report(rows, ['group', 'case', 'scale', 'old_ms', 'new_ms', 'time', 'old_mb', 'new_mb', 'memory', 'status'])
+sys.exit(1 if any(row['status'] in ['REGRESSION', 'ERROR', 'MISSING'] for row in rows) else 0)
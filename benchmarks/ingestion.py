@@ -0,0 +1,59 @@
+'''
+Measures the ingestion functions against the local stand-ins, on a
+recording when its folder is given and on fake fixtures otherwise, at
+several sizes. The players and advanced stats caches, and the advanced
+stats snapshot, are emptied before each run; get_league_data is measured
+as a repeated login, served from the caches and an incremental board sync.
+Run from the repository root:
+
+    python benchmarks/ingestion.py [recording_folder]
+'''
+import os
+import sys
+import common
+import standin
+import functions as api
+from config import advanced_options
+
+latency = 0.05
+scales = [1, 10]
+
+if len(sys.argv) > 1:
+    fixtures = standin.load_recording(sys.argv[1])
+else:
+    fixtures = standin.fake_fixtures()
+
+
+def get_advanced_stats():
+    # Empty the advanced stats cache and its snapshot, so they are read from the database
+    api.advanced_cache.update(df=None, rows=None, loaded=0, checked=0)
+    if os.path.exists(advanced_options['snapshot']):
+        os.remove(advanced_options['snapshot'])
+    return api.get_advanced_stats()
+
+
+rows = list()
+for scale in scales:
+    scaled = standin.scale_fixtures(fixtures, scale)
+    epoch = scaled['board'][-1]['date']
+    with standin.replay(scaled, latency=latency) as server:
+        cases = dict(
+            get_login=lambda: api.get_login('email', 'password'),
+            get_market=lambda: api.get_market('token', epoch, 'league', 'user', incremental=False),
+            get_players=lambda: api.players_cache.update(df=None, expires=0) or api.get_players(),
+            get_standings=lambda: api.get_standings('token', 'league', 'user'),
+            get_advanced_stats=get_advanced_stats,
+            get_league_data=lambda: api.get_league_data('token', epoch, 'league', 'user')
+        )
+        for name, case in cases.items():
+            server.requests = 0
+            elapsed, _ = common.measure(case, repeat=3)
+            rows.append(dict(
+                case=name,
+                scale=scale,
+                board_items=len(scaled['board']),
+                time_ms=round(elapsed * 1e3, 1),
+                requests=server.requests // 3
+            ))
+
+common.report(rows, ['case', 'scale', 'board_items', 'time_ms', 'requests'])
@@ -0,0 +1,34 @@
+'''
+Measures get_market against a local stand-in board with network-like
+latency, for different prefetch windows. Run from the repository root:
+
+    python benchmarks/market_paging.py
+'''
+import common
+from time import time
+from config import url
+import functions as api
+from standin import StandInServer, fake_board
+
+now = int(time())
+pages = 20
+board = fake_board(items=pages * 200 + 500, start=now)
+# Start date falls in the middle of the last page that has to be read
+epoch = board[pages * 200 - 100]['date']
+
+rows = list()
+with StandInServer(dict(board=board), latency=0.05) as server:
+    url['market'] = server.urls['market']
+    for window in [1, 2, 4, 8]:
+        server.requests = 0
+        elapsed, (market_df, rounds_df) = common.measure(
+            api.get_market, 'token', epoch, 'league', 'user', window=window, incremental=False, repeat=3)
+        rows.append(dict(
+            window=window,
+            time_s=round(elapsed, 3),
+            requests=server.requests // 3,
+            transfers=len(market_df),
+            rounds=len(rounds_df)
+        ))
+
+common.report(rows, ['window', 'time_s', 'requests', 'transfers', 'rounds'])
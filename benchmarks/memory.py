@@ -0,0 +1,68 @@
+'''
+Memory profile of the analysis functions behind each callback on large
+synthetic datasets: extra peak RSS of the process, and peak and retained Python
+allocations (tracemalloc). Every case runs in its own process so peak
+RSS is not shared between cases. Run from the repository root:
+
+    python benchmarks/memory.py
+'''
+import sys
+import json
+import resource
+import subprocess
+import tracemalloc
+import common
+import synthetic
+import pandas as pd
+import functions as api
+
+cases = {
+    'plot_player_efficiency': lambda data: api.plot_player_efficiency(data['players']),
+    'plot_recent_fitness': lambda data: api.plot_recent_fitness(data['players']),
+    'plot_links': lambda data: api.plot_links(data['market']),
+    'plot_advanced': lambda data: api.plot_advanced(data['advanced'], ['Abde Raihani 0', 'Abdón Prats 0']),
+    'get_ledger': lambda data: api.get_ledger(data['market'], data['rounds'], data['standings']),
+    'show_scoreboard': lambda data: api.show_scoreboard(20e6, data['ledger']),
+    'show_lastseason': lambda data: api.show_lastseason(data['players'], 'forward', [5, 25])
+}
+
+
+def load(scale):
+    members = 10 * scale
+    advanced_df = api.get_demo('advanced')
+    data = dict(
+        players=synthetic.players(500 * scale),
+        market=synthetic.market(5000 * scale, members),
+        rounds=synthetic.rounds(38, members),
+        standings=synthetic.standings(members),
+        advanced=pd.concat([advanced_df.assign(name=advanced_df['name'] + f' {i}') for i in range(scale // 2)], ignore_index=True)
+    )
+    data['ledger'] = api.get_ledger(data['market'], data['rounds'], data['standings'])
+    return data
+
+
+def run(case):
+    # Load the modules used by the function on small data, then measure on large data
+    cases[case](load(2))
+    data = load(100)
+    for cache in [api.figures, api.ledgers, api.players_index, api.rankings, api.advanced_maxima]:
+        cache.clear()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    cases[case](data)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(
+        case=case,
+        peak_rss_mb=round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024, 1),
+        peak_alloc_mb=round(peak / 1024 ** 2, 1),
+        retained_mb=round(current / 1024 ** 2, 1)
+    )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        print(json.dumps(run(sys.argv[1])))
+    else:
+        rows = [json.loads(subprocess.check_output([sys.executable, __file__, case]).decode().splitlines()[-1]) for case in cases]
+        common.report(rows, ['case', 'peak_rss_mb', 'peak_alloc_mb', 'retained_mb'])
@@ -0,0 +1,35 @@
+'''
+Measures the processing of the players feed by parse_players. Uses a
+recorded feed when its path is given, synthetic feeds otherwise. Run
+from the repository root:
+
+    python benchmarks/players_feed.py [recorded_feed.jsonp]
+'''
+import sys
+import common
+import synthetic
+import tracemalloc
+import functions as api
+
+if len(sys.argv) > 1:
+    with open(sys.argv[1], encoding='utf-8') as file:
+        feeds = [('recorded', file.read())]
+else:
+    feeds = [(f'synthetic {count}', synthetic.players_feed(count)) for count in [600, 6000, 60000]]
+
+rows = list()
+for name, text in feeds:
+    elapsed, df = common.measure(api.parse_players, text)
+    tracemalloc.start()
+    api.parse_players(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rows.append(dict(
+        feed=name,
+        size_kb=round(len(text) / 1024),
+        players=len(df),
+        time_ms=round(elapsed * 1e3, 1),
+        peak_alloc_mb=round(peak / 1024 ** 2, 1)
+    ))
+
+common.report(rows, ['feed', 'size_kb', 'players', 'time_ms', 'peak_alloc_mb'])
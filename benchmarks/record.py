@@ -0,0 +1,39 @@
+'''
+Records the responses of the Biwenger endpoints and the advanced stats of
+a real league, so the stand-ins in benchmarks/standin.py can replay them
+offline. Needs the credentials of a Biwenger account and access to the
+advanced stats database. Run from the repository root:
+
+    python benchmarks/record.py email password user league [folder]
+
+The recording is saved in ./data/.cache/recording unless a folder is given.
+Login tokens are not saved, but the league data is: keep recordings private.
+'''
+import os
+import sys
+import common
+import client
+import standin
+import functions as api
+from config import epoch
+
+if len(sys.argv) < 5:
+    sys.exit(__doc__)
+
+email, password, user, league = sys.argv[1:5]
+folder = sys.argv[5] if len(sys.argv) > 5 else './data/.cache/recording'
+
+# Biwenger endpoints, through the recording hook of the HTTP client
+client.recording['folder'] = folder
+token = api.get_login(email, password)
+market_df, rounds_df = api.get_market(token, epoch, league, user, incremental=False)
+players_df = api.get_players()
+standings_df = api.get_standings(token, league, user)
+client.recording['folder'] = None
+
+# Advanced stats, as a SQLite copy of the database table
+advanced_df = api.get_advanced_stats()
+standin.advanced_database(advanced_df, os.path.join(folder, 'advanced.sqlite'))
+
+print(f'Recorded {len(market_df)} transfers, {len(rounds_df)} round results, {len(players_df)} players, '
+      f'{len(standings_df)} members and {len(advanced_df)} advanced stats in {folder}')
@@ -0,0 +1,36 @@
+'''
+Measures the player scatter plots in SVG and WebGL mode, with and
+without leaving out low-scoring players: figure JSON size and build
+time. Client render time has to be measured in the browser. Run from
+the repository root:
+
+    python benchmarks/scatter_charts.py
+'''
+import common
+import synthetic
+import functions as api
+from config import scatter_options
+
+modes = [
+    ('svg', dict(webgl_points=float('inf'), min_points=None)),
+    ('webgl', dict(webgl_points=0, min_points=None)),
+    ('webgl, points >= 100', dict(webgl_points=0, min_points=100))
+]
+
+rows = list()
+for count in [430, 5000, 20000]:
+    players_df = synthetic.players(count)
+    for mode, options in modes:
+        scatter_options.update(options)
+        for chart in [api.plot_player_efficiency, api.plot_recent_fitness]:
+            elapsed, fig = common.measure(chart, players_df, ['Player 0'], repeat=3)
+            rows.append(dict(
+                players=count,
+                mode=mode,
+                chart=chart.__name__,
+                markers=sum(len(trace.x) for trace in fig.data),
+                size_kb=round(len(fig.to_json()) / 1024, 1),
+                build_ms=round(elapsed * 1e3, 1)
+            ))
+
+common.report(rows, ['players', 'mode', 'chart', 'markers', 'size_kb', 'build_ms'])
@@ -0,0 +1,29 @@
+'''
+Measures the ledger built after login and the scoreboard shown on each
+budget change, on synthetic leagues of growing size. Run from
+the repository root:
+
+    python benchmarks/scoreboard.py
+'''
+import common
+import synthetic
+import functions as api
+
+rows = list()
+for members, transfers in [(12, 1000), (100, 10000), (1000, 100000), (5000, 500000)]:
+    standings_df = synthetic.standings(members)
+    market_df = synthetic.market(transfers, members)
+    rounds_df = synthetic.rounds(38, members)
+    # Ledgers are cached per dataset, so empty the cache to time the whole build
+    ledger_time, ledger_df = common.measure(
+        lambda: api.ledgers.clear() or api.get_ledger(market_df, rounds_df, standings_df), repeat=3)
+    board_time, _ = common.measure(api.show_scoreboard, 20e6, ledger_df, repeat=3)
+    rows.append(dict(
+        members=members,
+        transfers=transfers,
+        round_rows=len(rounds_df),
+        ledger_ms=round(ledger_time * 1e3, 1),
+        scoreboard_ms=round(board_time * 1e3, 1)
+    ))
+
+common.report(rows, ['members', 'transfers', 'round_rows', 'ledger_ms', 'scoreboard_ms'])
@@ -0,0 +1,49 @@
+'''
+Compares the memory footprint of the session datasets as read from their
+source and after apply_schema, on the demo workbooks and on copies of
+them scaled up (more transfers and rounds among the same members, more
+players). Run from the repository root:
+
+    python benchmarks/session_memory.py
+'''
+import common
+import pandas as pd
+from cache import memory_size
+from functions import apply_schema
+
+datasets = ['market', 'rounds', 'players', 'advanced', 'standings']
+scales = [1, 10, 100]
+
+
+def scale_up(name, df, scale):
+    # Player tables get new names, league tables repeat the same members
+    if name == 'standings' or scale == 1:
+        return df
+    elif name in ['players', 'advanced']:
+        return pd.concat([df.assign(name=df['name'] + f' {i}') for i in range(scale)], ignore_index=True)
+    else:
+        return pd.concat([df] * scale, ignore_index=True)
+
+
+demo = {name: pd.read_excel(f'./data/{name}.xlsx') for name in datasets}
+
+rows = list()
+for scale in scales:
+    before = after = 0
+    for name in datasets:
+        raw = scale_up(name, demo[name], scale)
+        elapsed, lean = common.measure(apply_schema, name, raw, repeat=3)
+        before += memory_size(raw)
+        after += memory_size(lean)
+        rows.append(dict(
+            dataset=name,
+            scale=scale,
+            before_kb=round(memory_size(raw) / 1024),
+            after_kb=round(memory_size(lean) / 1024),
+            saved=f'{1 - memory_size(lean) / memory_size(raw):.0%}',
+            apply_ms=round(elapsed * 1e3, 1)
+        ))
+    rows.append(dict(dataset='session', scale=scale, before_kb=round(before / 1024), after_kb=round(after / 1024),
+                     saved=f'{1 - after / before:.0%}', apply_ms=''))
+
+common.report(rows, ['dataset', 'scale', 'before_kb', 'after_kb', 'saved', 'apply_ms'])
@@ -0,0 +1,347 @@
+'''
+Local stand-ins for the remote data sources, used to benchmark the
+ingestion functions without network access or Biwenger accounts.
+
+Fixtures are the data served by the stand-ins, as a dict with:
+
+- login: body of the login response.
+- board: league board items, newest first.
+- players: body of the JSONP players feed.
+- standings: body of the league standings response.
+- advanced: advanced stats dataframe, served from a SQLite database.
+
+They are either recorded from the real sources (see benchmarks/record.py)
+and read with load_recording, or generated with fake_fixtures. Both can be
+scaled up with scale_fixtures.
+'''
+import os
+import json
+import time
+import random
+import hashlib
+import tempfile
+import common
+import synthetic
+import pandas as pd
+import sqlalchemy as db
+import functions as api
+from threading import Thread
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from config import url, advanced_options, board_store
+
+# Real endpoints, used to tell recorded responses apart while url is replaced
+sources = dict(url)
+
+
+# ----------------------------------- Fixtures --------------------------------------
+
+def fake_board(items, start, step=3600, members=12, seed=0):
+    '''
+    Generates a synthetic league board sorted from newest to oldest.
+
+    :param items: number of news items.
+    :param start: date (epoch) of the newest item.
+    :param step: seconds between consecutive items.
+    :param members: number of league members.
+    :param seed: random seed.
+    :return: list of news items shaped like the Biwenger board.
+    '''
+
+    rng = random.Random(seed)
+    names = [f'Member {i}' for i in range(members)]
+    board = list()
+    for i in range(items):
+        date = start - i * step
+        kind = ('market', 'transfer', 'transfer', 'roundFinished')[i % 4]
+        if kind == 'market':
+            content = [
+                {'player': rng.randint(1, 30000), 'to': {'name': rng.choice(names)}, 'amount': rng.randint(1, 50) * 10 ** 5}
+                for _ in range(rng.randint(1, 4))
+            ]
+        elif kind == 'transfer':
+            content = [
+                {'player': rng.randint(1, 30000), 'from': {'name': rng.choice(names)}, 'amount': rng.randint(1, 50) * 10 ** 5}
+                | ({'to': {'name': rng.choice(names)}} if rng.random() < 0.5 else {})
+                for _ in range(rng.randint(1, 4))
+            ]
+        else:
+            content = {
+                'round': {'name': f'Round {items - i}'},
+                'results': [
+                    {'user': {'name': name}, 'points': rng.randint(20, 90), 'bonus': rng.randint(0, 10) * 10 ** 5}
+                    for name in names
+                ]
+            }
+        board.append({'type': kind, 'date': date, 'content': content})
+    return board
+
+
+def fake_standings(members, seed=0):
+    '''
+    Generates a league standings response with the fields dropped by
+    get_standings.
+
+    :param members: number of league members.
+    :param seed: random seed.
+    :return: standings response body.
+    '''
+
+    df = synthetic.standings(members, seed)
+    standings = [
+        dict(id=i, name=row.name, icon='', points=int(row.points), teamValue=int(row.teamValue),
+             position=int(row.position), lastPositions=[], role='player', lastAccess=0, lastTrophy=None, teamSize=15)
+        for i, row in enumerate(df.itertuples())
+    ]
+    return {'status': 200, 'data': {'standings': standings}}
+
+
+def fake_fixtures(board_items=500, players=600, members=12, start=None):
+    '''
+    Generates fixtures for all the data sources. The advanced stats are
+    the demo workbook.
+
+    :param board_items: number of league board items.
+    :param players: number of players in the feed.
+    :param members: number of league members.
+    :param start: date (epoch) of the newest board item (now by default).
+    :return: fixtures dict.
+    '''
+
+    return dict(
+        login={'status': 200, 'token': 'standin'},
+        board=fake_board(board_items, start or int(time.time()), members=members),
+        players=synthetic.players_feed(players),
+        standings=fake_standings(members),
+        advanced=api.get_demo('advanced')
+    )
+
+
+def load_recording(folder):
+    '''
+    Reads the responses saved by the recording hook of app/client.py and
+    the advanced stats database saved by benchmarks/record.py. Board pages
+    are joined in offset order.
+
+    :param folder: recording folder.
+    :return: fixtures dict.
+    '''
+
+    fixtures = dict()
+    pages = dict()
+    # Paths of the real endpoints and of the stand-ins
+    paths = {name: {urlsplit(address).path, f'/{name}'} for name, address in sources.items()}
+
+    for file in os.listdir(folder):
+        if not file.endswith('.json'):
+            continue
+        with open(os.path.join(folder, file), encoding='utf-8') as handle:
+            response = json.load(handle)
+        address = urlsplit(response['url'])
+        if address.path.endswith('/auth/login'):
+            fixtures['login'] = json.loads(response['body'])
+        elif address.path.endswith('/board'):
+            offset = int(parse_qs(address.query).get('offset', [0])[0])
+            pages[offset] = json.loads(response['body'])['data']
+        elif address.path in paths['players']:
+            fixtures['players'] = response['body']
+        elif address.path in paths['standings']:
+            fixtures['standings'] = json.loads(response['body'])
+
+    # Join consecutive pages, from the newest item
+    board, offset = list(), 0
+    while offset in pages and pages[offset]:
+        board.extend(pages[offset])
+        offset += len(pages[offset])
+    fixtures['board'] = board
+
+    database = os.path.join(folder, 'advanced.sqlite')
+    if os.path.exists(database):
+        fixtures['advanced'] = pd.read_sql_table('players', db.create_engine(f'sqlite:///{database}'))
+
+    return fixtures
+
+
+def scale_fixtures(fixtures, scale):
+    '''
+    Makes fixtures 'scale' times larger. The board is repeated further in
+    the past with new round names, and the players feed and the advanced
+    stats get renamed copies of every player. League members are kept.
+
+    :param fixtures: fixtures dict.
+    :param scale: size factor.
+    :return: scaled fixtures dict.
+    '''
+
+    if scale == 1:
+        return fixtures
+    scaled = dict(fixtures)
+
+    if fixtures.get('board'):
+        board = fixtures['board']
+        span = board[0]['date'] - board[-1]['date'] + 3600
+        scaled['board'] = [
+            dict(news, date=news['date'] - k * span, content=dict(
+                news['content'], round={'name': f'{news["content"]["round"]["name"]} ({k})'}))
+            if news['type'] == 'roundFinished' and k else dict(news, date=news['date'] - k * span)
+            for k in range(scale) for news in board
+        ]
+
+    if fixtures.get('players'):
+        text = fixtures['players']
+        feed = json.loads(text[text.index('(') + 1:text.rindex(')')])
+        players = feed['data']['players']
+        step = max(int(key) for key in players) + 1
+        feed['data']['players'] = {
+            str(int(key) + k * step): dict(player, id=int(key) + k * step, name=f'{player["name"]} {k}' if k else player['name'])
+            for k in range(scale) for key, player in players.items()
+        }
+        scaled['players'] = text[:text.index('(') + 1] + json.dumps(feed) + ')'
+
+    if fixtures.get('advanced') is not None:
+        df = fixtures['advanced']
+        scaled['advanced'] = pd.concat(
+            [df.assign(name=df['name'].astype(str) + (f' {k}' if k else '')) for k in range(scale)], ignore_index=True)
+
+    return scaled
+
+
+def advanced_database(df, path):
+    '''
+    Saves advanced stats as the 'players' table of a SQLite database,
+    which get_advanced_stats reads like the remote database.
+
+    :param df: advanced stats dataframe.
+    :param path: path of the SQLite database.
+    :return: database url.
+    '''
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    engine = db.create_engine(f'sqlite:///{path}')
+    # Categorical and mixed columns are stored as their values
+    df.astype({col: object for col in df.select_dtypes('category')}).to_sql(
+        'players', engine, if_exists='replace', index=False, chunksize=10000)
+    engine.dispose()
+    return f'sqlite:///{path}'
+
+
+# ------------------------------------ Server ---------------------------------------
+
+class StandInServer:
+    '''
+    Threaded HTTP server answering the Biwenger endpoints from fixtures,
+    with an artificial latency per request. Board pages are sliced from
+    the fixture board with the requested offset and limit.
+    '''
+
+    def __init__(self, fixtures, latency=0.05):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Keep-alive connections: send small responses without waiting for acks
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self.answer(server.fixtures['login'] if self.path.startswith('/auth/login') else None)
+
+            def do_GET(self):
+                address = urlsplit(self.path)
+                if address.path.endswith('/board'):
+                    query = parse_qs(address.query)
+                    offset = int(query.get('offset', [0])[0])
+                    limit = int(query.get('limit', [200])[0])
+                    self.answer({'status': 200, 'data': server.fixtures['board'][offset:offset + limit]})
+                elif address.path == '/players':
+                    self.answer(server.fixtures['players'], 'application/javascript')
+                elif address.path == '/standings':
+                    self.answer(server.fixtures['standings'])
+                else:
+                    self.answer(None)
+
+            def answer(self, content, content_type='application/json'):
+                server.requests += 1
+                time.sleep(server.latency)
+                if content is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = (content if isinstance(content, str) else json.dumps(content)).encode()
+                etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/'
+        self.urls = dict(
+            login=self.url + 'auth/login',
+            market=self.url + 'league/',
+            players=self.url + 'players',
+            standings=self.url + 'standings'
+        )
+
+    def __enter__(self):
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@contextmanager
+def replay(fixtures, latency=0.05):
+    '''
+    Points the data sources of the app to stand-ins serving fixtures: a
+    local HTTP server for the Biwenger endpoints and a SQLite database
+    for the advanced stats. The board store, the advanced stats snapshot
+    and the process caches are moved to a temporary folder while
+    replaying, and everything is restored on exit.
+
+    :param fixtures: fixtures dict.
+    :param latency: seconds added to every HTTP request.
+    :return: the running stand-in server.
+    '''
+
+    saved = dict(url=dict(url), advanced=dict(advanced_options), store=dict(board_store))
+
+    def reset():
+        api.players_cache.update(df=None, etag=None, modified=None, expires=0)
+        if api.advanced_db['engine'] is not None:
+            api.advanced_db['engine'].dispose()
+        api.advanced_db.update(engine=None, table=None)
+        api.advanced_cache.update(df=None, rows=None, loaded=0, checked=0)
+
+    with tempfile.TemporaryDirectory() as folder, StandInServer(fixtures, latency) as server:
+        url.update(server.urls)
+        board_store['path'] = os.path.join(folder, 'board.sqlite')
+        advanced_options['snapshot'] = os.path.join(folder, 'advanced.pkl')
+        if fixtures.get('advanced') is not None:
+            advanced_options['url'] = advanced_database(fixtures['advanced'], os.path.join(folder, 'advanced.sqlite'))
+        reset()
+        try:
+            yield server
+        finally:
+            reset()
+            url.update(saved['url'])
+            advanced_options.update(saved['advanced'])
+            board_store.update(saved['store'])
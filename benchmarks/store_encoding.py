@@ -0,0 +1,33 @@
+'''
+Compares the size and decode time of the 'app-data' encodings on the
+demo datasets and on a live-shaped players table parsed from a synthetic
+feed, as typed in a session (categoricals, UTC datetimes, nullable
+integers, fitness lists), and whether the decoded frames keep those types.
+Run from the repository root:
+
+    python benchmarks/store_encoding.py
+'''
+import common
+import synthetic
+import functions as api
+from store import encode, parse
+
+datasets = {name: api.get_demo(name) for name in ['market', 'rounds', 'players', 'advanced', 'standings']}
+# The live feed keeps fitness as lists mixing points with 'injured' and None
+datasets['players (live)'] = api.parse_players(synthetic.players_feed(600))
+encodings = ['json', 'parquet']
+
+rows = list()
+for name, df in datasets.items():
+    for encoding in encodings:
+        payload = encode(df, encoding)
+        elapsed, decoded = common.measure(parse, payload, repeat=20)
+        rows.append(dict(
+            dataset=name,
+            encoding=encoding,
+            size_kb=round(len(payload) / 1024, 1),
+            decode_ms=round(elapsed * 1e3, 2),
+            dtypes_kept=decoded.dtypes.astype(str).equals(df.dtypes.astype(str))
+        ))
+
+common.report(rows, ['dataset', 'encoding', 'size_kb', 'decode_ms', 'dtypes_kept'])
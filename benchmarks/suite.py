@@ -0,0 +1,378 @@
+'''
+Benchmark suite of the app: wall time and peak memory of the functions in
+app/functions.py and of the Dash callbacks in app/app.py, on the demo data
+and on synthetic data scaled up 10x, 100x and 1000x. Run from the
+repository root:
+
+    python benchmarks/suite.py [--scales demo,10,100,1000] [--groups ...] [--output file.json]
+
+Groups:
+
+- ingestion: get_* functions against the local stand-ins (benchmarks/standin.py)
+  and the login callback. The demo scale reads the demo workbooks and uses
+  fake fixtures of the same size for the stand-ins.
+- analysis: get_ledger, show_* and plot_* functions.
+- callbacks-server: chart, players, table and scoreboard callbacks with
+  server-side sessions.
+- callbacks-json: the same callbacks with the datasets in the browser as
+  JSON, so every run decodes the store. Callback runs also parse the
+  request and serialize the response like Dash does.
+
+Synthetic data keeps the 12 league members of the demo and scales the
+transfers, round results and players. The advanced stats are renamed
+copies of the demo ones. Every run starts with empty caches ('time_ms',
+best of several runs) and is followed by a run served from the caches
+('warm_ms'). 'peak_mb' is the peak of Python allocations (tracemalloc)
+during a cold run and 'max_rss_mb' the high-water mark of the process
+after the case. 'rows' is the size of the inputs: board items for the
+ingestion group, transfers plus players for the others. Each group and
+scale runs in its own process with a memory limit, and a case that fails
+or runs out of memory is reported with its error. At 1000x, the stand-in
+fixtures and the JSON store need more memory than small machines have.
+
+Results are saved as JSON, by default in benchmarks/results/<commit>.json,
+and two result files are compared with benchmarks/compare.py.
+'''
+import os
+import sys
+import json
+import argparse
+import platform
+import signal
+import resource
+import subprocess
+import tracemalloc
+import common
+import pandas as pd
+from datetime import datetime, timezone
+from time import perf_counter
+from config import warm_up_options, session_options, board_store, advanced_options
+
+# No background warm-up while measuring
+warm_up_options.update(demo=False, players=False)
+
+import cache
+import store
+import synthetic
+import standin
+import functions as api
+import app as dash_app
+import plotly.io.json as plotly_json
+from dash import no_update
+from dash._utils import AttributeDict
+from dash._callback_context import context_value
+
+datasets = ['market', 'rounds', 'players', 'advanced', 'standings']
+groups = ['ingestion', 'analysis', 'callbacks-server', 'callbacks-json']
+scales = ['demo', '10', '100', '1000']
+# Demo players compared in the advanced stats chart
+names = ('Abde Raihani', 'Abdón Prats')
+# Placeholder of the 'app-data' store in the callback arguments of the cases
+APP_DATA = object()
+
+
+# ------------------------------------- Data ----------------------------------------
+
+def league_data(scale):
+    '''
+    Returns the session datasets at a scale, with the column types set by
+    apply_schema as in a real session.
+
+    :param scale: 'demo' or the size factor of the synthetic data.
+    :return: dict with the datasets and the ledger.
+    '''
+
+    if scale == 'demo':
+        data = {name: api.get_demo(name) for name in datasets}
+    else:
+        scale = int(scale)
+        members = 12
+        advanced_df = api.get_demo('advanced')
+        data = dict(
+            market=synthetic.market(1100 * scale, members),
+            rounds=synthetic.rounds(39 * scale, members),
+            players=synthetic.players(430 * scale),
+            standings=synthetic.standings(members),
+            advanced=pd.concat([advanced_df.assign(name=advanced_df['name'].astype(str) + (f' {k}' if k else ''))
+                                for k in range(scale)], ignore_index=True)
+        )
+        data = {name: api.apply_schema(name, df) for name, df in data.items()}
+    data['ledger'] = api.get_ledger(data['market'], data['rounds'], data['standings'])
+    return data
+
+
+def fixtures(scale):
+    '''
+    Returns the stand-in fixtures at a scale, sized like the demo data at
+    the demo scale.
+
+    :param scale: 'demo' or the size factor.
+    :return: fixtures dict.
+    '''
+
+    base = standin.fake_fixtures(board_items=450, players=480)
+    return standin.scale_fixtures(base, 1 if scale == 'demo' else int(scale))
+
+
+def clear_caches():
+    # Process caches of the app, so every run does the whole work
+    for lru in [api.figures, api.ledgers, api.players_index, api.rankings, api.advanced_maxima, store.decoded]:
+        lru.clear()
+    cache.versions.clear()
+    api.bin_colors.cache_clear()
+
+
+def clear_sources():
+    # Caches of the data sources, the advanced stats snapshot and database
+    # connection, and the local board store
+    api.players_cache.update(df=None, etag=None, modified=None, expires=0)
+    api.advanced_cache.update(df=None, rows=None, loaded=0, checked=0)
+    if api.advanced_db['engine'] is not None:
+        api.advanced_db['engine'].dispose()
+    api.advanced_db.update(engine=None, table=None)
+    api.demo_frames.clear()
+    for path in [advanced_options['snapshot'], board_store['path']]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# ------------------------------------ Cases ----------------------------------------
+
+def trigger(callback, prop_id, *args):
+    '''
+    Runs a Dash callback as triggered by prop_id.
+
+    :param callback: callback function.
+    :param prop_id: id and property of the triggering component.
+    :return: callback outputs.
+    '''
+
+    context_value.set(AttributeDict(triggered_inputs=[{'prop_id': prop_id, 'value': 1}]))
+    return callback(*args)
+
+
+def request(body, callback, prop_id, *args):
+    '''
+    Runs a callback end-to-end: parses the request body holding the
+    'app-data' store, runs the callback with it in place of APP_DATA in
+    args, and serializes its outputs.
+
+    :param body: JSON request body with the 'app-data' store.
+    :param callback: callback function.
+    :param prop_id: id and property of the triggering component.
+    :param args: callback arguments, with APP_DATA in place of the store.
+    :return: size of the response in bytes.
+    '''
+
+    app_data = json.loads(body)
+    args = [app_data if arg is APP_DATA else arg for arg in args]
+    return len(plotly_json.to_json_plotly(trigger(callback, prop_id, *args)))
+
+
+def logged_in(outputs):
+    # The login callback reports errors in the modal instead of raising them
+    if outputs[1] is not no_update:
+        raise Exception(outputs[1])
+    return outputs
+
+
+def ingestion_cases(scale, epoch):
+    login = dash_app.login
+    if scale == 'demo':
+        demo_login = dict(
+            get_demo=lambda: [api.get_demo(name) for name in datasets],
+            login_demo=lambda: logged_in(trigger(login, 'modal-btn.n_clicks', 1, None, None, None, None))
+        )
+    else:
+        demo_login = dict()
+    return dict(
+        get_login=lambda: api.get_login('email', 'password'),
+        get_market=lambda: api.get_market('token', epoch, 'league', 'user'),
+        get_players=lambda: api.get_players(),
+        get_standings=lambda: api.get_standings('token', 'league', 'user'),
+        get_advanced_stats=lambda: api.get_advanced_stats(),
+        get_league_data=lambda: api.get_league_data('token', epoch, 'league', 'user'),
+        login=lambda: logged_in(trigger(login, 'modal-btn.n_clicks', 1, 'email', 'password', 'user', 'league')),
+        **demo_login
+    )
+
+
+def analysis_cases(data):
+    players_df, market_df, advanced_df, ledger_df = data['players'], data['market'], data['advanced'], data['ledger']
+    return dict(
+        get_ledger=lambda: api.get_ledger(data['market'], data['rounds'], data['standings']),
+        show_scoreboard=lambda: api.show_scoreboard(20e6, ledger_df),
+        show_lastseason=lambda: api.show_lastseason(players_df, 'forward', [5, 25]),
+        show_background_colors=lambda: api.show_background_colors(players_df, ['points', 'price', 'pointsLastSeason']),
+        plot_player_efficiency=lambda: api.plot_player_efficiency(players_df),
+        plot_recent_fitness=lambda: api.plot_recent_fitness(players_df),
+        plot_links=lambda: api.plot_links(market_df),
+        plot_advanced=lambda: api.plot_advanced(advanced_df, names),
+        get_figure=lambda: api.get_figure(api.plot_player_efficiency, players_df)
+    )
+
+
+def callback_cases(body):
+    chart, table = dash_app.update_chart, dash_app.update_table
+    return dict(
+        update_chart_efficiency=lambda: request(body, chart, 'btn-efficiency.n_clicks', 1, 1, 1, 1, 1, APP_DATA, None, None),
+        update_chart_links=lambda: request(body, chart, 'btn-links.n_clicks', 1, 1, 1, 1, 1, APP_DATA, None, None),
+        update_chart_fitness=lambda: request(body, chart, 'btn-fitness.n_clicks', 1, 1, 1, 1, 1, APP_DATA, None, None),
+        update_chart_advanced=lambda: request(body, chart, 'btn-chart-filter.n_clicks', 1, 1, 1, 1, 1, APP_DATA, *names),
+        update_players=lambda: request(body, dash_app.update_players, 'chart-filter-radio.value', 'forward', APP_DATA),
+        update_table_lastseason=lambda: request(body, table, 'btn-lastseason.n_clicks', 1, 'forward', [0, 100], APP_DATA),
+        update_table_filter=lambda: request(body, table, 'lastseason-slider.value', 1, 'midfielder', [5, 25], APP_DATA),
+        update_scoreboard=lambda: request(body, dash_app.update_scoreboard, 'app-data.data', 20, APP_DATA),
+        update_accordion=lambda: len(plotly_json.to_json_plotly(dash_app.update_accordion('/players')))
+    )
+
+
+# ----------------------------------- Measures --------------------------------------
+
+def measure(case, clear, repeat):
+    '''
+    Measures one case: best cold time, peak allocations of a cold run and
+    the time of a run served from the caches.
+
+    :param case: function running the case.
+    :param clear: function emptying the caches used by the case.
+    :param repeat: number of cold runs timed.
+    :return: dict with the measures.
+    '''
+
+    best = float('inf')
+    for _ in range(repeat):
+        clear()
+        start = perf_counter()
+        case()
+        best = min(best, perf_counter() - start)
+
+    clear()
+    tracemalloc.start()
+    case()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    start = perf_counter()
+    case()
+    warm = perf_counter() - start
+
+    return dict(
+        time_ms=round(best * 1e3, 2),
+        warm_ms=round(warm * 1e3, 2),
+        peak_mb=round(peak / 1024 ** 2, 2),
+        max_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    )
+
+
+def run(group, scale, repeat):
+    '''
+    Runs the cases of a group at a scale.
+
+    :param group: name of the group.
+    :param scale: 'demo' or the size factor.
+    :param repeat: number of cold runs timed per case.
+    :return: list of result rows.
+    '''
+
+    rows = list()
+
+    def add(cases, clear, size):
+        for name, case in cases.items():
+            row = dict(group=group, case=name, scale=scale, rows=size)
+            try:
+                row.update(measure(case, clear, repeat))
+            except Exception as error:
+                row['error'] = summary(error)
+            rows.append(row)
+
+    if group == 'ingestion':
+        scaled = fixtures(scale)
+        epoch = scaled['board'][-1]['date']
+        # The login callback reads the board from the start date set in config.py
+        dash_app.epoch = epoch
+        with standin.replay(scaled, latency=0):
+            add(ingestion_cases(scale, epoch), lambda: (clear_caches(), clear_sources()), len(scaled['board']))
+    else:
+        data = league_data(scale)
+        size = len(data['market']) + len(data['players'])
+        if group == 'analysis':
+            add(analysis_cases(data), clear_caches, size)
+        else:
+            session_options.update(server_side=group == 'callbacks-server', encoding='json')
+            body = json.dumps(store.save(data))
+            add(callback_cases(body), clear_caches, size)
+
+    return rows
+
+
+def summary(error):
+    # First line of an error message, as some (e.g. SQL errors) hold whole datasets
+    message = str(error).strip().splitlines()
+    return f'{type(error).__name__}: {message[0][:200] if message else ""}'
+
+
+def metadata():
+    # Commit and environment of the results
+    def git(*args):
+        try:
+            return subprocess.check_output(['git', *args], stderr=subprocess.DEVNULL).decode().strip()
+        except Exception:
+            return None
+    return dict(
+        commit=git('rev-parse', '--short', 'HEAD'),
+        dirty=bool(git('status', '--porcelain', '--untracked-files=no')),
+        date=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        python=platform.python_version(),
+        pandas=pd.__version__,
+        platform=platform.platform()
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark suite of the app')
+    parser.add_argument('--scales', default=','.join(scales), help='comma-separated scales')
+    parser.add_argument('--groups', default=','.join(groups), help='comma-separated groups')
+    parser.add_argument('--repeat', type=int, default=3, help='cold runs timed per case (1 at 1000x)')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--max-memory', type=float, default=0.8,
+                        help='memory limit of each process, as a fraction of the physical memory')
+    parser.add_argument('--run', nargs=2, metavar=('GROUP', 'SCALE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: one group at one scale. Cases running out of memory
+    # raise MemoryError instead of exhausting the machine.
+    if args.run:
+        limit = int(args.max_memory * os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES'))
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        print(json.dumps(run(*args.run, args.repeat)))
+        sys.exit()
+
+    results = list()
+    for scale in args.scales.split(','):
+        for group in args.groups.split(','):
+            repeat = 1 if scale not in ['demo', '10', '100'] else args.repeat
+            child = subprocess.run(
+                [sys.executable, __file__, '--run', group, scale, '--repeat', str(repeat),
+                 '--max-memory', str(args.max_memory)],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            if child.returncode == 0:
+                results.extend(json.loads(child.stdout.decode().splitlines()[-1]))
+            else:
+                # Errors outside the cases (e.g. building the data) fail the whole group
+                error = child.stderr.decode().strip().splitlines()
+                if child.returncode < 0:
+                    error = [f'killed by {signal.Signals(-child.returncode).name}']
+                results.append(dict(group=group, case='*', scale=scale,
+                                    error=error[-1][:200] if error else f'exit code {child.returncode}'))
+            common.report([row for row in results if row['group'] == group and row['scale'] == scale],
+                          ['group', 'case', 'scale', 'rows', 'time_ms', 'warm_ms', 'peak_mb', 'max_rss_mb', 'error'])
+            print()
+
+    meta = metadata()
+    output = args.output or os.path.join('benchmarks', 'results', f'{meta["commit"] or "results"}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(dict(meta, results=results), file, indent=1)
+    print(f'Results saved in {output}')
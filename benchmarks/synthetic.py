@@ -0,0 +1,89 @@
+'''
+Synthetic league datasets for benchmarks, shaped like the frames
+produced by the functions in app/functions.py.
+'''
+import numpy as np
+import pandas as pd
+
+
+def standings(members, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'name': [f'Member {i}' for i in range(members)],
+        'points': rng.integers(0, 3000, members),
+        'teamValue': rng.integers(10, 300, members) * 10 ** 5,
+        'position': np.arange(1, members + 1)
+    })
+
+
+def market(transfers, members, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.array([f'Member {i}' for i in range(members)] + ['market'])
+    dates = pd.Timestamp('2023-07-10') + pd.to_timedelta(rng.integers(0, 300 * 86400, transfers), unit='s')
+    return pd.DataFrame({
+        'player_id': rng.integers(1, 30000, transfers),
+        'seller': names[rng.integers(0, members + 1, transfers)],
+        'buyer': names[rng.integers(0, members + 1, transfers)],
+        'amount': rng.integers(1, 500, transfers) * 10 ** 5,
+        'date': dates.strftime('%d-%m-%Y %H:%M:%S')
+    })
+
+
+def rounds(count, members, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'round': np.repeat([f'Round {i + 1}' for i in range(count)], members),
+        'member': np.tile([f'Member {i}' for i in range(members)], count),
+        'points': rng.integers(0, 100, count * members),
+        'bonus': rng.integers(0, 20, count * members) * 10 ** 5
+    })
+
+
+def players(count, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = np.array(['keeper', 'defender', 'midfielder', 'forward'])
+    home = rng.integers(0, 19, count)
+    away = rng.integers(0, 19, count)
+    played = np.maximum(home + away, 1)
+    points = rng.integers(1, 250, count)
+    price = rng.integers(1, 300, count) * 10 ** 5
+    fitness = rng.integers(-4, 15, (count, 5))
+    df = pd.DataFrame({
+        'id': np.arange(count),
+        'name': [f'Player {i}' for i in range(count)],
+        'position': positions[rng.integers(0, 4, count)],
+        'status': np.where(rng.random(count) < 0.9, 'ok', 'injured'),
+        'price': price,
+        'playedHome': home,
+        'playedAway': away,
+        'fitness': fitness.tolist(),
+        'points': points,
+        'pointsLastSeason': np.where(rng.random(count) < 0.8, rng.integers(0, 280, count), np.nan),
+        'played': played
+    })
+    df['fitness_total'] = fitness.sum(axis=1)
+    df['points_per_game'] = points / played
+    df['points_per_mill'] = points / (price / 1e6)
+    return df
+
+
+def players_feed(count, seed=0):
+    '''
+    Builds a JSONP players feed shaped like the Biwenger competition
+    data, with fitness lists mixing scores, missing games and statuses.
+    '''
+    import json
+    rng = np.random.default_rng(seed)
+    df = players(count, seed)
+    codes = {'keeper': 1, 'defender': 2, 'midfielder': 3, 'forward': 4}
+    entries = [None, 'injured', 'sanctioned']
+    feed = dict()
+    for row, fitness in zip(df.itertuples(), rng.integers(-6, 15, (count, 5)).tolist()):
+        feed[str(row.id)] = {
+            'id': row.id, 'name': row.name, 'position': codes[row.position], 'price': row.price,
+            'status': row.status, 'playedHome': row.playedHome, 'playedAway': row.playedAway,
+            'fitness': [score if score > -4 else entries[score % 3] for score in fitness],
+            'points': int(row.points) if row.Index % 10 else 0,
+            'pointsLastSeason': None if np.isnan(row.pointsLastSeason) else int(row.pointsLastSeason)
+        }
+    return 'jsonp_1465365482(' + json.dumps({'status': 200, 'data': {'players': feed}}) + ')'
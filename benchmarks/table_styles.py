@@ -0,0 +1,31 @@
+'''
+Measures the conditional styles sent with the tables: number of rules,
+JSON payload size and time to compute them. Run from the repository root:
+
+    python benchmarks/table_styles.py
+'''
+import json
+import common
+import synthetic
+import functions as api
+
+players_df = api.get_demo('players')
+tables = [
+    ('lastseason top 10', players_df.nlargest(10, 'pointsLastSeason'), ['pointsLastSeason']),
+    ('demo players', players_df, ['points', 'price']),
+    ('scoreboard 1000', synthetic.standings(1000), ['teamValue']),
+    ('scoreboard 5000', synthetic.standings(5000), ['teamValue'])
+]
+
+rows = list()
+for name, df, columns in tables:
+    elapsed, styles = common.measure(api.show_background_colors, df, columns)
+    rows.append(dict(
+        table=name,
+        rows=len(df),
+        rules=len(styles),
+        payload_kb=round(len(json.dumps(styles)) / 1024, 1),
+        time_ms=round(elapsed * 1e3, 2)
+    ))
+
+common.report(rows, ['table', 'rows', 'rules', 'payload_kb', 'time_ms'])